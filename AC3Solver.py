@@ -1,121 +1,133 @@
-class AC3Solver:
-    def __init__(self, board):
+from collections import deque
+
+from Backjumping import Backjumping
+from CandidateBoard import CandidateBoard
+from SolutionCounting import SolutionCounting
+
+class AC3Solver(Backjumping, SolutionCounting):
+    def __init__(self, board, stats=None, backjump=True, nogoods=None):
         self.board = board
-        self.domains = self._initialize_domains()
-
-    def solve(self):
-        # Apply AC-3 for initial constraint propagation
-        if not self._ac3():
-            return False  # Conflict found during propagation
-        return self._heuristic_solve()
-
-    def _initialize_domains(self):
-        domains = {}
-        for row in range(9):
-            for col in range(9):
-                if self.board[row][col] == 0:
-                    domains[(row, col)] = set(range(1, 10))  # Possible values 1-9
-                else:
-                    domains[(row, col)] = {self.board[row][col]}  # Only one possible value
-        return domains
+        self.grid = CandidateBoard(board)
+        # Domains are the grid's candidate bitmasks, indexed by flat cell index (row * N + col)
+        self.domains = self.grid.candidates
+        self.peers = self.grid.index.peers
+        self.count = self.grid.count
+        self.stats = stats  # Optional SearchStats
+        # Jump back to the assignment behind a failure rather than to the previous one; with
+        # `nogoods`, also remember up to that many failing combinations of assignments
+        self._init_backjumping(backjump, nogoods)
+
+    # Apply AC-3 for initial constraint propagation; False on a conflict
+    def _start(self):
+        return self._propagate()
+
+    # Run AC-3, through the stats counters when they are enabled
+    def _propagate(self, assigned=None):
+        if self.stats is None:
+            return self._ac3(assigned)
+        return self.stats.propagate(self.grid, self._ac3, assigned)
 
     # Arc Consistency Algorithm (AC-3). Ensures that the domains of variables are consistent with their neighbors.
-    def _ac3(self):
-        queue = [(var, neighbor) for var in self.domains for neighbor in self._get_neighbors(*var)]
-        
+    # With no argument every arc is checked; given a just-assigned cell, only the arcs pointing at it are queued.
+    def _ac3(self, assigned=None):
+        if assigned is None:
+            queue = deque((var, neighbor) for var in self.grid.index.cells for neighbor in self.peers[var])
+        else:
+            queue = deque((neighbor, assigned) for neighbor in self.peers[assigned])
+        queued = set(queue)  # Arcs currently waiting, so none is queued twice
+
+        domains, count = self.domains, self.count
         while queue:
-            var, neighbor = queue.pop(0)
+            arc = queue.popleft()
+            queued.discard(arc)
+            var, neighbor = arc
             if self._revise(var, neighbor):
-                if len(self.domains[var]) == 0:
+                if not domains[var]:
+                    if assigned is not None:
+                        self._blame(len(self.assigned) - 1, self.culprits[var])
                     return False  # Domain wipeout indicates inconsistency
-                for neighbor_of_var in self._get_neighbors(*var):
-                    if neighbor_of_var != neighbor:
-                        queue.append((neighbor_of_var, var))
+                # Only a single remaining value can remove support from var's neighbors
+                if count[domains[var]] == 1:
+                    for neighbor_of_var in self.peers[var]:
+                        if neighbor_of_var != neighbor:
+                            arc = (neighbor_of_var, var)
+                            if arc not in queued:
+                                queued.add(arc)
+                                queue.append(arc)
         return True
 
     # Revises the domain of var to ensure consistency with neighbor. Returns True if the domain of var was modified.
     def _revise(self, var, neighbor):
-        revised = False
-        for value in self.domains[var].copy():
-            if not any(value != neighbor_value for neighbor_value in self.domains[neighbor]):
-                self.domains[var].remove(value)
-                revised = True
-        return revised
-
-    def _heuristic_solve(self):
+        # A value of var loses its support only when the neighbor's domain is exactly that value
+        neighbor_domain = self.domains[neighbor]
+        if self.count[neighbor_domain] == 1 and self.domains[var] & neighbor_domain:
+            # Logged on the trail so backtracking can undo it, and blamed on whatever left the neighbor one value
+            self._prune(var, neighbor_domain, self.culprits[neighbor])
+            return True
+        return False
+
+    # The search tree: the empty cell with the fewest values branches on them in LCV order
+    def _branch(self):
         if not self._has_empty_cell():
-            return True  # Puzzle solved
+            self._solution()
+            return None  # Puzzle solved
 
         # Choose cell using MRV (Minimum Remaining Values)
-        row, col = self._select_mrv()
-        if (row, col) is None:
-            return True
+        i = self._select_mrv()
+        if i is None:
+            self._open(hidden=True)
+            return 0, ()  # An empty cell has no value left: a dead end
 
         # Try values in LCV (Least Constraining Value) order
-        values = self._least_constraining_values(row, col)
-        for num in values:
-            if self._is_valid(num, row, col):
-                self.board[row][col] = num
-                self.domains[(row, col)] = {num}  # Update domain to reflect placement
-                if self._ac3() and self._heuristic_solve():
-                    return True
-                self.board[row][col] = 0  # Undo move
-                self.domains[(row, col)] = set(range(1, 10))  # Restore domain for backtracking
-        return False
+        values = [num for num in self._least_constraining_values(i) if self.grid.can_place(i, num)]
+        self._open(hidden=len(values) != self.count[self.domains[i]])
+        return i, values
+
+    def _try(self, i, num):
+        mark = len(self.grid.trail)
+        level = self._assign(i, num)
+        if level is None:
+            return False, mark  # A learned nogood already rules this assignment out
+        others = self.domains[i] ^ self.grid.bit[num]
+        if others:
+            self._prune(i, others, 1 << level)  # Update domain to reflect placement
+        return self._propagate(i), mark
+
+    def _undo(self, i, num, mark):
+        # Backtrack: undo this branch's pruning, keeping everything pruned before it
+        self._rollback(mark)
+        self._unassign(i)  # Undo move
 
-    # Select empty cell with smallest domain
+    # Select empty cell with smallest domain; a single value cannot be beaten, so the scan stops at the first
     def _select_mrv(self):
-        min_remaining = float('inf')
+        cells, domains, count = self.grid.cells, self.domains, self.grid.count
+        min_remaining = self.grid.size + 1
         min_cell = None
-        for (row, col), domain in self.domains.items():
-            if self.board[row][col] == 0 and 0 < len(domain) < min_remaining:
-                min_remaining = len(domain)
-                min_cell = (row, col)
+        for i in self.grid.index.cells:
+            if cells[i] == 0:
+                remaining = count[domains[i]]
+                if 0 < remaining < min_remaining:
+                    min_remaining = remaining
+                    min_cell = i
+                    if remaining == 1:
+                        break
         return min_cell
 
-    def _least_constraining_values(self, row, col):
+    def _least_constraining_values(self, i):
         # Sort values by how few restrictions they place on neighbors
-        values = list(self.domains[(row, col)])
-        values.sort(key=lambda val: self._count_constraints(val, row, col))
+        values = list(self.grid.digits[self.domains[i]])
+        values.sort(key=lambda val: self._count_constraints(val, i))
         return values
 
-    def _count_constraints(self, val, row, col):
+    def _count_constraints(self, val, i):
         # Count the number of constraints this value imposes on neighbors
+        bit = self.grid.bit[val]
+        domains = self.domains
         count = 0
-        for neighbor in self._get_neighbors(row, col):
-            if val in self.domains[neighbor]:
+        for neighbor in self.peers[i]:
+            if domains[neighbor] & bit:
                 count += 1
         return count
 
     def _has_empty_cell(self):
-        for row in range(9):
-            for col in range(9):
-                if self.board[row][col] == 0:
-                    return True
-        return False
-
-    def _is_valid(self, num, row, col):
-        if num in self.board[row]:
-            return False
-        if num in [self.board[i][col] for i in range(9)]:
-            return False
-        start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(start_row, start_row + 3):
-            for j in range(start_col, start_col + 3):
-                if self.board[i][j] == num:
-                    return False
-        return True
-
-    def _get_neighbors(self, row, col):
-        neighbors = set()
-        for i in range(9):
-            if (row, i) != (row, col):
-                neighbors.add((row, i))
-            if (i, col) != (row, col):
-                neighbors.add((i, col))
-        start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-        for r in range(start_row, start_row + 3):
-            for c in range(start_col, start_col + 3):
-                if (r, c) != (row, col):
-                    neighbors.add((r, c))
-        return neighbors
+        return 0 in self.grid.cells
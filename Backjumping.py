@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+
+class NogoodStore:
+    """
+    Learned nogoods: sets of assignments that cannot all hold in a solution of the puzzle. An
+    assignment is any hashable value; Backjumping encodes cell = value as cell << 5 | value.
+    The most recently used `capacity` nogoods are kept; nogoods of more than `max_size`
+    assignments are too specific to recur and are not stored.
+    """
+
+    def __init__(self, capacity=1024, max_size=8):
+        self.capacity = capacity
+        self.max_size = max_size
+        self.entries = OrderedDict()  # Nogood (a frozenset of assignments) -> None, oldest first
+        self.watch = {}  # Assignment -> the stored nogoods containing it
+        self.learned = 0
+        self.hits = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, assignments):
+        nogood = frozenset(assignments)
+        if not nogood or len(nogood) > self.max_size:
+            return
+        if nogood in self.entries:
+            self.entries.move_to_end(nogood)
+            return
+        self.entries[nogood] = None
+        for assignment in nogood:
+            self.watch.setdefault(assignment, set()).add(nogood)
+        self.learned += 1
+        if len(self.entries) > self.capacity:
+            oldest, _ = self.entries.popitem(last=False)
+            for assignment in oldest:
+                watchers = self.watch[assignment]
+                watchers.discard(oldest)
+                if not watchers:
+                    del self.watch[assignment]
+            self.evicted += 1
+
+    def check(self, assignment, current):
+        """A stored nogood that `assignment` completes, given the set of `current` assignments it is in, or None."""
+        for nogood in self.watch.get(assignment, ()):
+            if nogood <= current:
+                self.entries.move_to_end(nogood)
+                self.hits += 1
+                return nogood
+        return None
+
+
+class Backjumping:
+    """
+    Mixin adding conflict-directed backjumping, and optionally nogood learning, to a
+    SolutionCounting solver over a CandidateBoard.
+
+    Branch point d assigns one cell at level d. Every candidate the solver removes goes through
+    `_prune(cell, bits, reason)`, where reason is a bitmask of the levels whose assignments forced
+    the removal, so `culprits[cell]` always tells which levels emptied that cell's domain so far.
+    When a value fails, the solver blames the culprits of the cell it wiped out on its level
+    (`_blame`). When every value of a branch point has failed, `_backjump` unwinds straight to
+    the deepest level to blame, skipping the branch points in between, whose values played no
+    part in the failure; chronological backtracking would search each of them in turn. The
+    assignments to blame are also learned as a nogood when a NogoodStore is given.
+    """
+
+    def _init_backjumping(self, backjump, nogoods):
+        cells = len(self.grid.cells)
+        self.backjump = backjump
+        # Capacity of the NogoodStore (None for no learning); learning needs backjumping's conflict sets
+        self.nogoods = NogoodStore(nogoods) if nogoods and backjump else None
+        self.culprits = [0] * cells  # Per cell: the levels that removed its missing candidates
+        self.saved = []  # Per grid.trail entry: the culprits of its cell before that removal
+        self.assigned = []  # The cell assigned at each level
+        self.conflicts = [0] * (cells + 1)  # Per level: the earlier levels blamed for its failed values
+        self.found = False  # After a solution every failure is blamed on all levels, to count on soundly
+        self.current = set()  # With nogoods: the assignments made, each encoded as cell << 5 | value
+
+    def _prune(self, i, bits, reason):
+        self.saved.append(self.culprits[i])
+        self.culprits[i] |= reason
+        self.grid.remove(i, bits)
+
+    # Undo the removals since the trail mark, culprits included: CandidateBoard.undo with one more list
+    def _rollback(self, mark):
+        trail, saved, candidates, culprits = self.grid.trail, self.saved, self.grid.candidates, self.culprits
+        for _ in range(len(trail) - mark):
+            i, bits = trail.pop()
+            candidates[i] |= bits
+            culprits[i] = saved.pop()
+
+    # A new branch point; `hidden` when it skips domain values for reasons the culprits do not record
+    def _open(self, hidden=False):
+        level = len(self.assigned)
+        self.conflicts[level] = (1 << level) - 1 if hidden or self.found else 0
+
+    # Place num in cell i at the next level and return that level, or None when a nogood forbids it
+    def _assign(self, i, num):
+        level = len(self.assigned)
+        self.assigned.append(i)
+        self.grid.place(i, num)
+        if self.nogoods is not None:
+            assignment = i << 5 | num
+            self.current.add(assignment)
+            nogood = self.nogoods.check(assignment, self.current)
+            if nogood is not None:
+                levels = self.assigned.index
+                self._blame(level, sum(1 << levels(other >> 5) for other in nogood if other != assignment))
+                return None
+        return level
+
+    def _unassign(self, i):
+        self.assigned.pop()
+        if self.nogoods is not None:
+            self.current.discard(i << 5 | self.grid.cells[i])
+        self.grid.unplace(i)
+
+    def _blame(self, level, culprits):
+        self.conflicts[level] |= culprits
+
+    def _solution(self):
+        self.found = True
+        for level in range(len(self.assigned)):
+            self.conflicts[level] = (1 << level) - 1
+
+    def _backjump(self, i, depth):
+        # Every value of the branch point on cell i at level `depth` failed: resume at the deepest level to blame
+        if not self.backjump:
+            return depth
+        conflict = (self.conflicts[depth] | self.culprits[i]) & ((1 << depth) - 1)
+        if not conflict:
+            return 0  # The givens alone rule the cell out: no solution
+        target = conflict.bit_length() - 1
+        if self.nogoods is not None and not self.found:
+            cells, assigned = self.grid.cells, self.assigned
+            self.nogoods.add(
+                assigned[level] << 5 | cells[assigned[level]] for level in range(target + 1) if conflict >> level & 1
+            )
+        self.conflicts[target] |= conflict ^ (1 << target)
+        return target + 1
@@ -0,0 +1,202 @@
+from math import isqrt
+
+# Characters of the values 0-25 in the line format: 0 is a blank, 10 and up are letters,
+# so 16x16 puzzles use 1-9A-G and 25x25 puzzles 1-9A-P
+SYMBOLS = "0123456789ABCDEFGHIJKLMNOP"
+VALUES = {".": 0, **{ch: value for value, symbol in enumerate(SYMBOLS) for ch in (symbol, symbol.lower())}}
+
+# Line lengths of the board sizes the line format covers: 4x4, 9x9, 16x16 and 25x25
+LINE_LENGTHS = (16, 81, 256, 625)
+
+# bytes.translate tables between line characters and cell values; characters outside the
+# format map to 255, which no board size accepts
+_PARSE = bytes(VALUES.get(chr(byte), 255) for byte in range(256))
+_FORMAT = SYMBOLS.encode().ljust(256, b"?")
+
+
+class Board:
+    """
+    An N x N Sudoku board stored as one flat buffer of N * N bytes, row-major, 0 for blanks.
+
+    It keeps the list-of-lists interface the solvers use: len(board), iterating rows,
+    board[row][col], board[row][col] = value and board[row][:] = values, where a row slice
+    reads as a new list. Copies are copy-on-write: clone() and from_buffer() share the buffer
+    they are given, and a board only copies it into its own bytearray on the first write.
+    """
+
+    __slots__ = ("size", "_cells", "_shared")
+
+    def __init__(self, rows):
+        """Copy a board given as a list of lists (or any sequence of rows)."""
+        self.size = len(rows)
+        self._cells = bytearray(value for row in rows for value in row)
+        self._shared = False
+        if len(self._cells) != self.size * self.size:
+            raise ValueError(f"expected {self.size} rows of {self.size} values")
+
+    @classmethod
+    def empty(cls, size=9):
+        return cls._wrap(bytearray(size * size), size, False)
+
+    @classmethod
+    def from_buffer(cls, data, size=None):
+        """
+        A board over the bytes of data (bytes, bytearray, memoryview, mmap...) without copying them.
+        The board never writes through to data: its first write copies the cells.
+        """
+        view = memoryview(data).cast("B")
+        size = isqrt(len(view)) if size is None else size
+        if size * size != len(view):
+            raise ValueError(f"expected {size * size} cells, got {len(view)}")
+        return cls._wrap(view, size, True)
+
+    @classmethod
+    def from_line(cls, line):
+        """
+        Parse a puzzle line: 81 characters for a 9x9 board, 256 for 16x16 or 625 for 25x25
+        (16 for 4x4), with '0' or '.' for blanks and letters for values above 9.
+        """
+        line = line.strip()
+        if len(line) not in LINE_LENGTHS:
+            expected = ", ".join(map(str, LINE_LENGTHS[:-1])) + f" or {LINE_LENGTHS[-1]}"
+            raise ValueError(f"expected {expected} characters, got {len(line)} in {line!r}")
+        size = isqrt(len(line))
+        try:
+            cells = bytearray(line.encode("ascii").translate(_PARSE))
+        except UnicodeEncodeError:
+            cells = b"\xff"
+        if max(cells) > size:
+            for ch in line:
+                if ch not in VALUES:
+                    raise ValueError(f"unexpected character {ch!r} in {line!r}")
+            raise ValueError(f"value out of range for a {size}x{size} board in {line!r}")
+        return cls._wrap(cells, size, False)
+
+    @classmethod
+    def _wrap(cls, cells, size, shared):
+        board = cls.__new__(cls)
+        board.size = size
+        board._cells = cells
+        board._shared = shared
+        return board
+
+    def clone(self):
+        """A copy of the board in O(1): both share the buffer until either one writes."""
+        self._shared = True
+        return Board._wrap(self._cells, self.size, True)
+
+    def _own(self):
+        # Copy-on-write: take a private, writable copy of the buffer before the first change
+        self._cells = bytearray(self._cells)
+        self._shared = False
+
+    def load(self, values):
+        """Overwrite every cell from a flat row-major sequence of N * N values."""
+        if self._shared:
+            self._own()
+        self._cells[:] = bytes(values)
+
+    def to_line(self):
+        """Serialise to the line format, 0 for blanks."""
+        return bytes(self._cells).translate(_FORMAT).decode("ascii")
+
+    def tolist(self):
+        size, cells = self.size, self._cells
+        return [list(cells[start:start + size]) for start in range(0, size * size, size)]
+
+    def __bytes__(self):
+        return bytes(self._cells)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.size
+        if not 0 <= row < self.size:
+            raise IndexError("board row out of range")
+        return _Row(self, row * self.size)
+
+    def __iter__(self):
+        for start in range(0, self.size * self.size, self.size):
+            yield _Row(self, start)
+
+    def __eq__(self, other):
+        if isinstance(other, Board):
+            return self.size == other.size and self._cells == other._cells
+        try:
+            return self.tolist() == [list(row) for row in other]
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return Board.from_buffer, (bytes(self._cells), self.size)
+
+    def __repr__(self):
+        return f"Board.from_line({self.to_line()!r})"
+
+    def __array__(self, dtype=None, copy=None):
+        # Lets NumPy read the cells as a (N, N) uint8 array without building rows
+        import numpy as np
+
+        array = np.frombuffer(self._cells, dtype=np.uint8).reshape(self.size, self.size)
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+
+class _Row:
+    """One row of a Board, read and written through to the board's buffer."""
+
+    __slots__ = ("board", "start")
+
+    def __init__(self, board, start):
+        self.board = board
+        self.start = start
+
+    def __len__(self):
+        return self.board.size
+
+    def __getitem__(self, col):
+        board = self.board
+        if isinstance(col, slice):
+            return list(board._cells[self.start:self.start + board.size])[col]
+        if col < 0:
+            col += board.size
+        if not 0 <= col < board.size:
+            raise IndexError("board column out of range")
+        return board._cells[self.start + col]
+
+    def __setitem__(self, col, value):
+        board = self.board
+        if board._shared:
+            board._own()
+        if isinstance(col, slice):
+            values = list(board._cells[self.start:self.start + board.size])
+            values[col] = value
+            if len(values) != board.size:
+                raise ValueError("a board row cannot change length")
+            board._cells[self.start:self.start + board.size] = bytes(values)
+            return
+        if col < 0:
+            col += board.size
+        if not 0 <= col < board.size:
+            raise IndexError("board column out of range")
+        board._cells[self.start + col] = value
+
+    def __iter__(self):
+        return iter(self.board._cells[self.start:self.start + self.board.size])
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def tolist(self):
+        return list(self)
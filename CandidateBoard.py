@@ -0,0 +1,132 @@
+# Bitmask representation of an N x N Sudoku board shared by the solvers.
+# Digit d is stored as bit (d - 1), so a cell's candidates fit in an N-bit integer.
+from functools import lru_cache
+
+from Board import Board
+from SudokuIndex import board_index
+
+# Largest board size whose digit tables are built in full; bigger boards compute them per mask
+TABLE_LIMIT = 16
+
+
+class _DigitsOf:
+    """Stands in for the DIGITS table where 2**N entries would be too many: digits[mask] is computed on demand."""
+
+    def __getitem__(self, mask):
+        digits = []
+        while mask:
+            low = mask & -mask
+            digits.append(low.bit_length())
+            mask ^= low
+        return tuple(digits)
+
+
+class _CountOf:
+    """Stands in for the COUNT table in the same way."""
+
+    def __getitem__(self, mask):
+        return bin(mask).count("1")
+
+
+@lru_cache(maxsize=None)
+def digit_tables(size):
+    """
+    Lookup tables of an N x N board as (all_digits, bit, digits, count).
+
+    bit[d] is the mask of digit d (bit[0] == 0 so empty cells need no special case), digits[mask]
+    the ascending tuple of digits in mask and count[mask] its size.
+    """
+    all_digits = (1 << size) - 1
+    bit = [0] + [1 << (d - 1) for d in range(1, size + 1)]
+    if size > TABLE_LIMIT:
+        return all_digits, bit, _DigitsOf(), _CountOf()
+    digits = [tuple(d for d in range(1, size + 1) if mask & bit[d]) for mask in range(all_digits + 1)]
+    return all_digits, bit, digits, [len(ds) for ds in digits]
+
+
+# The standard 9x9 tables, re-exported as module constants
+ALL_DIGITS, BIT, DIGITS, COUNT = digit_tables(9)
+
+
+class CandidateBoard:
+    def __init__(self, board):
+        # The board's side length fixes the index and digit tables; 9x9 boards share the module tables
+        self.size = len(board)
+        self.index = board_index(self.size)
+        self.row_of, self.col_of, self.box_of = self.index.row_of, self.index.col_of, self.index.box_of
+        self.all_digits, self.bit, self.digits, self.count = digit_tables(self.size)
+        row_of, col_of, box_of, bit_of = self.row_of, self.col_of, self.box_of, self.bit
+
+        if isinstance(board, Board):
+            self.cells = list(bytes(board))
+        else:
+            self.cells = [value for row in board for value in row]
+        # Occupancy masks: digits already placed in each row, column and box
+        self.rows = [0] * self.size
+        self.cols = [0] * self.size
+        self.boxes = [0] * self.size
+        # Candidate masks: givens hold their own digit, empty cells start with every digit
+        self.candidates = [self.all_digits] * len(self.cells)
+        # False when two givens share a digit in some row, column or box
+        self.consistent = True
+        for i, value in enumerate(self.cells):
+            if value:
+                bit = bit_of[value]
+                if bit & (self.rows[row_of[i]] | self.cols[col_of[i]] | self.boxes[box_of[i]]):
+                    self.consistent = False
+                self.rows[row_of[i]] |= bit
+                self.cols[col_of[i]] |= bit
+                self.boxes[box_of[i]] |= bit
+                self.candidates[i] = bit
+        # Undo log of (cell, removed bits) pairs; len(trail) is a mark that undo() rolls back to
+        self.trail = []
+
+    # Digits not yet used in the row, column or box of cell i
+    def free(self, i):
+        return self.all_digits & ~(self.rows[self.row_of[i]] | self.cols[self.col_of[i]] | self.boxes[self.box_of[i]])
+
+    def can_place(self, i, num):
+        bit = self.bit[num]
+        return not (bit & (self.rows[self.row_of[i]] | self.cols[self.col_of[i]] | self.boxes[self.box_of[i]]))
+
+    def place(self, i, num):
+        bit = self.bit[num]
+        self.cells[i] = num
+        self.rows[self.row_of[i]] |= bit
+        self.cols[self.col_of[i]] |= bit
+        self.boxes[self.box_of[i]] |= bit
+
+    def unplace(self, i):
+        mask = ~self.bit[self.cells[i]]
+        self.cells[i] = 0
+        self.rows[self.row_of[i]] &= mask
+        self.cols[self.col_of[i]] &= mask
+        self.boxes[self.box_of[i]] &= mask
+
+    # Remove the digits in bits (all present in cell i) from its candidates and log them on the trail
+    def remove(self, i, bits):
+        self.candidates[i] ^= bits
+        self.trail.append((i, bits))
+
+    # Restore every candidate removed since the trail had length mark
+    def undo(self, mark):
+        trail, candidates = self.trail, self.candidates
+        while len(trail) > mark:
+            i, bits = trail.pop()
+            candidates[i] |= bits
+
+    # Index of the first empty cell in row-major order, or None when the board is full
+    def find_empty(self):
+        try:
+            return self.cells.index(0)
+        except ValueError:
+            return None
+
+    # Copy the flat cells back into a list-of-lists board, in place
+    def write_back(self, board):
+        if isinstance(board, Board):
+            board.load(self.cells)
+            return
+        cells, size = self.cells, self.size
+        for row in range(size):
+            board[row][:] = cells[row * size:row * size + size]
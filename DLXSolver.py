@@ -0,0 +1,155 @@
+from functools import lru_cache
+
+from CandidateBoard import CandidateBoard
+from SolutionCounting import SolutionCounting
+from SudokuIndex import board_index
+
+# Sudoku as exact cover: for an N x N board, 4 N^2 constraint columns (cell filled, row/column/box
+# holds digit) and N^3 options, one per (cell, digit), each covering exactly 4 columns.
+ROOT = 0  # Header of the column list; column headers are nodes 1..4 N^2, option nodes follow
+
+
+def _option_columns(index, option):
+    size = index.size
+    area = size * size
+    i, d = divmod(option, size)
+    return (
+        1 + i,
+        1 + area + index.row_of[i] * size + d,
+        1 + 2 * area + index.col_of[i] * size + d,
+        1 + 3 * area + index.box_of[i] * size + d,
+    )
+
+
+@lru_cache(maxsize=None)
+def links_for(size):
+    """Build the full exact-cover matrix of an N x N board as flat link arrays: left, right, up, down, column, size.
+    Built once per board size; each solver works on its own copies of these lists."""
+    index = board_index(size)
+    columns = 4 * size * size
+    options = size * size * size
+    nodes = 1 + columns + 4 * options
+    left, right, up, down, column = [0] * nodes, [0] * nodes, [0] * nodes, [0] * nodes, [0] * nodes
+    count = [0] * (columns + 1)
+    for h in range(columns + 1):
+        left[h], right[h] = h - 1, h + 1
+        up[h] = down[h] = column[h] = h
+    left[ROOT], right[columns] = columns, ROOT
+
+    node = columns + 1
+    for option in range(options):
+        first = node
+        for k, col in enumerate(_option_columns(index, option)):
+            column[node] = col
+            up[node], down[node] = up[col], col
+            down[up[col]] = node
+            up[col] = node
+            count[col] += 1
+            left[node] = node - 1 if k else first + 3
+            right[node] = node + 1 if k < 3 else first
+            node += 1
+    return left, right, up, down, column, count
+
+
+# The standard 9x9 matrix, built at import so the first solve does not pay for it
+LINKS = links_for(9)
+
+
+class DLXSolver(SolutionCounting):
+    def __init__(self, board, stats=None):
+        self.board = board
+        self.grid = CandidateBoard(board)
+        self.left, self.right, self.up, self.down, self.column, self.size = (
+            links[:] for links in links_for(self.grid.size)
+        )
+        # Option nodes start after the root and the column headers
+        self.first_option = 1 + 4 * len(self.grid.cells)
+        self.solution = []  # Options chosen during search
+        self.stats = stats  # Optional SearchStats
+
+    def _record_solution(self):
+        for option in self.solution:
+            i, d = divmod(option, self.grid.size)
+            self.grid.cells[i] = d + 1
+
+    def _start(self):
+        # Givens are options chosen up front: remove the columns they cover
+        for i, value in enumerate(self.grid.cells):
+            if value:
+                node = self.first_option + 4 * (i * self.grid.size + value - 1)
+                for k in range(4):
+                    self._cover(self.column[node + k])
+        return True
+
+    # Knuth's Algorithm X on the dancing links, branching on the column with the fewest options.
+    # The column stays covered while its options are tried, and is uncovered by _leave.
+    def _branch(self):
+        right, size = self.right, self.size
+        if right[ROOT] == ROOT:
+            return None  # Every constraint is covered
+
+        best = col = right[ROOT]
+        while col != ROOT and size[best] > 1:
+            if size[col] < size[best]:
+                best = col
+            col = right[col]
+        self._cover(best)
+        return best, self._options(best)
+
+    # The option rows of a covered column, read lazily: the links below are restored before each step
+    def _options(self, col):
+        down = self.down
+        row = down[col]
+        while row != col:
+            yield row
+            row = down[row]
+
+    def _try(self, col, row):
+        right, column = self.right, self.column
+        self.solution.append((row - self.first_option) // 4)
+        node = right[row]
+        while node != row:
+            self._cover(column[node])
+            node = right[node]
+        return True, None
+
+    def _undo(self, col, row, token):
+        left, column = self.left, self.column
+        node = left[row]
+        while node != row:
+            self._uncover(column[node])
+            node = left[node]
+        self.solution.pop()
+
+    def _leave(self, col):
+        self._uncover(col)
+
+    # Unlink column col and every option that intersects it from the other columns
+    def _cover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        left[right[col]] = left[col]
+        right[left[col]] = right[col]
+        row = down[col]
+        while row != col:
+            node = right[row]
+            while node != row:
+                up[down[node]] = up[node]
+                down[up[node]] = down[node]
+                size[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    # Exact inverse of _cover, relinking in reverse order
+    def _uncover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        row = up[col]
+        while row != col:
+            node = left[row]
+            while node != row:
+                size[column[node]] += 1
+                up[down[node]] = node
+                down[up[node]] = node
+                node = left[node]
+            row = up[row]
+        left[right[col]] = col
+        right[left[col]] = col
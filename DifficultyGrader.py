@@ -0,0 +1,103 @@
+from ConstraintPropagationWithMRVSolver import ConstraintPropagationWithMRVSolver
+from PropagationEngine import RULES, PropagationEngine
+
+# Difficulty levels from easiest to hardest, each with the inference rules it adds to the levels
+# before it; "guess" adds none and takes search
+TECHNIQUES = {
+    "singles": ("naked_singles", "hidden_singles"),
+    "pairs": ("naked_pairs", "hidden_pairs", "pointing"),
+    "triples": ("naked_triples", "hidden_triples"),
+    "guess": (),
+}
+LEVELS = tuple(TECHNIQUES)
+
+
+def parse_band(spec):
+    """Parse a difficulty band given as one level ("pairs") or a range of them ("pairs-guess") into (low, high)."""
+    low, _, high = spec.partition("-")
+    high = high or low
+    for level in (low, high):
+        if level not in TECHNIQUES:
+            raise ValueError(f"unknown difficulty level {level!r}; expected one of {', '.join(LEVELS)}")
+    if LEVELS.index(low) > LEVELS.index(high):
+        raise ValueError(f"difficulty band {spec!r} runs from a harder level to an easier one")
+    return low, high
+
+
+class DifficultyGrader(ConstraintPropagationWithMRVSolver):
+    """
+    Grades a puzzle by the techniques it needs, in the same search that counts its solutions.
+
+    The search starts by propagating with the rules of one level after another on the same grid,
+    each level adding its rules to those before; rules only remove candidates that no solution
+    uses, so a rule set reaches the same fixed point from any earlier state of the grid. The first
+    level whose rules solve the puzzle is its level, and a puzzle solved by rules alone has exactly
+    one solution. Any other puzzle is "guess": the MRV search with every rule takes over from the
+    grid the rules left, counting its nodes as well as the solutions.
+
+    With a `band` of (low, high) level names the grader gives up as soon as the puzzle falls
+    outside it, without searching: the rules below `low` solving the puzzle make it too easy, and
+    the rules up to `high` leaving it unsolved make it too hard. `missed` then says which, and the
+    level is only a bound: a too easy puzzle needs at most the level given, a too hard one at least.
+    """
+
+    def __init__(self, board, stats=None, band=None):
+        super().__init__(board, stats, rules=RULES)
+        low, high = band or (LEVELS[0], LEVELS[-1])
+        self.low, self.high = LEVELS.index(low), LEVELS.index(high)
+        self.level = None  # Index into LEVELS once graded; None when the puzzle has no solution
+        self.missed = None  # "easy" or "hard" when the grader gave up outside the band
+        self.eliminations = {}  # Candidates each level's rules removed, for the levels that ran
+        self.nodes = 0  # Search nodes after the rules, the branching a "guess" puzzle needs
+        self.solution_count = None  # Solutions found, up to the limit; None when the search never ran
+
+    def grade(self, limit=2):
+        """
+        Grade the puzzle, counting its solutions up to `limit`, and return the name of its level,
+        None when it has no solution. Call on a fresh grader; the board is not modified.
+        """
+        solutions = self.count_solutions(limit)
+        # A puzzle the grader gave up on as too hard was never searched, so its solutions are unknown
+        self.solution_count = None if self.missed == "hard" else solutions
+        if not solutions and self.missed is None:
+            self.level = None
+        return None if self.level is None else LEVELS[self.level]
+
+    def as_dict(self):
+        return {
+            "level": None if self.level is None else LEVELS[self.level],
+            "missed": self.missed,
+            "solution_count": self.solution_count,
+            "nodes": self.nodes,
+            "eliminations": dict(self.eliminations),
+        }
+
+    # Propagate level by level until the rules solve the puzzle, it leaves the band or search must take over
+    def _start(self):
+        grid, count = self.grid, self.grid.count
+        rules = []
+        for level, name in enumerate(LEVELS[:-1]):
+            # Every level runs, even below the band: the cheap rules shrink the grid for the costly ones
+            rules += TECHNIQUES[name]
+            mark = len(grid.trail)
+            self.engine = PropagationEngine(grid, rules)
+            if not self._propagate():
+                return False  # No solution
+            self.eliminations[name] = sum(count[bits] for _, bits in grid.trail[mark:])
+            if max(map(count.__getitem__, self.domains)) == 1:
+                self.level = level
+                if level < self.low:
+                    self.missed = "easy"
+                return True
+            if level == self.high:
+                self.level = level + 1
+                self.missed = "hard"
+                return False
+        self.level = len(LEVELS) - 1
+        return True
+
+    def _branch(self):
+        branch = super()._branch()
+        if branch is not None:
+            self.nodes += 1
+        return branch
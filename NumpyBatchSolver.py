@@ -0,0 +1,132 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from ConstraintPropagationWithMRVSolver import ConstraintPropagationWithMRVSolver
+from SudokuIndex import board_index
+
+
+@lru_cache(maxsize=None)
+def board_arrays(size):
+    """
+    Index arrays of an N x N board over the flat cell layout, as (unit_cells, cell_units, digit_bit, shifts).
+
+    unit_cells is (3N, N), the cells of each unit; cell_units is (N^2, 3), the units of each cell;
+    digit_bit maps a digit to its mask (0 for blanks) and shifts holds the bit position of each digit.
+    """
+    index = board_index(size)
+    dtype = np.uint16 if size <= 16 else np.uint32
+    return (
+        np.array(index.units),
+        np.array(index.units_of),
+        np.array([0] + [1 << d for d in range(size)], dtype=dtype),
+        np.arange(size, dtype=dtype),
+    )
+
+
+class NumpyBatchSolver:
+    # Solver used for the puzzles that naked and hidden singles alone cannot finish
+    fallback_class = ConstraintPropagationWithMRVSolver
+    # Tells batch.solve_lines to hand over whole chunks instead of one board at a time
+    batched = True
+
+    def __init__(self, board, stats=None):
+        # Either a single board or several of the same size, as nested lists or a (count, N, N) uint8 array
+        self.board = board
+        boards = np.asarray(board, dtype=np.uint8)
+        self.single = boards.ndim == 2
+        self.size = boards.shape[-1]
+        self.arrays = board_arrays(self.size)
+        self.grids = boards.reshape(-1, self.size * self.size).copy()
+        self.solved = np.zeros(len(self.grids), dtype=bool)
+        self.stats = stats  # Optional SearchStats, also handed to the fallback searches
+
+    # Solve every puzzle; returns True when all of them were solved.
+    # Solutions are written back into the board passed in, and self.solved marks which puzzles succeeded.
+    def solve(self):
+        if self.stats is None:
+            self._solve()
+        else:
+            self.stats.run(self._solve)
+        self._write_back()
+        return bool(self.solved.all())
+
+    def _solve(self):
+        active = np.arange(len(self.grids))
+        while active.size:
+            grids = self.grids[active]
+            if self.stats is None:
+                progress, complete, dead = self._propagate(grids)
+            else:
+                start = time.perf_counter()
+                progress, complete, dead = self._propagate(grids)
+                self.stats.propagation_time += time.perf_counter() - start
+                self.stats.propagations += 1
+            self.grids[active] = grids
+            self.solved[active[complete]] = True
+
+            # Only puzzles where propagation stalled drop to per-puzzle search
+            stalled = ~(progress | complete | dead)
+            for index in active[stalled]:
+                self._search(index)
+            active = active[progress]
+
+    # One round of naked and hidden singles across all grids at once, placing every forced digit.
+    # Returns boolean arrays (progress, complete, dead) with one entry per grid.
+    def _propagate(self, grids):
+        unit_cells, cell_units, digit_bit, shifts = self.arrays
+        empty = grids == 0
+        bits = digit_bit[grids]
+        unit_bits = bits[:, unit_cells]
+        used = np.bitwise_or.reduce(unit_bits, axis=2)  # (n, 3N) digits placed in each unit
+        # Distinct powers of two sum to their OR, so a mismatch means a digit repeats in a unit
+        dead = (unit_bits.sum(axis=2, dtype=np.int64) != used).any(axis=1)
+        complete = ~empty.any(axis=1) & ~dead
+
+        peer_used = np.bitwise_or.reduce(used[:, cell_units], axis=2)
+        # One 0/1 entry per (cell, digit) for the digits no peer holds, unpacked once and counted from here on
+        cell_candidates = ((~peer_used[:, :, None] >> shifts) & 1).astype(np.uint8)
+        cell_candidates[~empty] = 0
+        counts = cell_candidates.sum(axis=2)
+        dead |= (empty & (counts == 0)).any(axis=1)
+
+        # Naked singles: empty cells with one candidate left
+        values = np.where(empty & (counts == 1), cell_candidates.argmax(axis=2) + 1, 0)
+
+        # Hidden singles: digits missing from a unit with exactly one cell left to hold them
+        unit_candidates = cell_candidates[:, unit_cells]
+        digit_counts = unit_candidates.sum(axis=2)  # (n, 3N, N)
+        missing = ((used[:, :, None] >> shifts) & 1) == 0
+        dead |= (missing & (digit_counts == 0)).any(axis=(1, 2))
+        grid, unit, digit = np.nonzero(missing & (digit_counts == 1))
+        position = unit_candidates[grid, unit, :, digit].argmax(axis=1)
+        values[grid, unit_cells[unit, position]] = digit + 1
+
+        # Every placement is forced, so a clash between two of them surfaces as dead on the next round
+        values[dead | complete] = 0
+        placed = values > 0
+        grids[placed] = values[placed]
+        return placed.any(axis=1), complete, dead
+
+    def _search(self, index):
+        board = self.grids[index].reshape(self.size, self.size).tolist()
+        if self.stats is None:
+            solver = self.fallback_class(board)
+        else:
+            solver = self.fallback_class(board, stats=self.stats)
+        if solver.solve():
+            self.grids[index] = np.array(board, dtype=np.uint8).reshape(-1)
+            self.solved[index] = True
+
+    # Copy the solved grids back into the caller's board(s), leaving unsolved puzzles untouched
+    def _write_back(self):
+        if isinstance(self.board, np.ndarray):
+            shape = (-1, self.size, self.size)
+            self.board.reshape(shape)[self.solved] = self.grids[self.solved].reshape(shape)
+            return
+        boards = [self.board] if self.single else self.board
+        for index in np.flatnonzero(self.solved):
+            solution = self.grids[index].reshape(self.size, self.size).tolist()
+            for row in range(self.size):
+                boards[index][row][:] = solution[row]
@@ -0,0 +1,148 @@
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+from BacktrackingSolver import BacktrackingSolver
+from ConstraintPropagationWithMRVSolver import ConstraintPropagationWithMRVSolver
+from DLXSolver import DLXSolver
+from SearchStats import SearchStats
+
+# Solvers raced when none are chosen: exact cover, propagation with MRV and plain backtracking
+# fail on different puzzles, so one of them usually answers quickly
+DEFAULT_PORTFOLIO = {
+    "DLX": DLXSolver,
+    "ConstraintPropagationWithMRV": ConstraintPropagationWithMRVSolver,
+    "Backtracking": BacktrackingSolver,
+}
+
+# SearchStats counters added together when the winner's statistics are merged into the caller's
+_SUMMED = ("nodes", "backtracks", "backjumps", "propagations", "pruned", "propagation_time", "total_time")
+
+
+class NodeBudgetExceeded(Exception):
+    pass
+
+
+class PortfolioSolver:
+    """
+    Races several solver classes on the same board, one process each, and takes the first answer.
+
+    `solvers` maps names to solver classes (default: DEFAULT_PORTFOLIO). `time_budgets` and
+    `node_budgets` map some of those names to seconds and search nodes: a solver over its budget
+    is dropped from the race. `timeout` bounds the whole race. The first solver to finish, solved
+    or proven unsolvable, wins and the others are terminated at once. When none finishes,
+    solve() returns False with `status` "timeout" instead of "unsolvable", or "error" when every
+    solver failed with an error before any ran out of time or nodes.
+    """
+
+    def __init__(self, board, stats=None, solvers=None, time_budgets=None, node_budgets=None, timeout=None):
+        self.board = board
+        self.stats = stats  # Optional SearchStats, given the winner's counters
+        self.solvers = dict(DEFAULT_PORTFOLIO if solvers is None else solvers)
+        self.time_budgets = time_budgets or {}
+        self.node_budgets = node_budgets or {}
+        self.timeout = timeout
+        self.status = None  # "solved", "unsolvable", "timeout" or "error" once solve() returns
+        self.winner = None  # Name of the solver whose answer was taken
+        # Per solver: its answer, "time budget", "node budget", "timeout", "cancelled" or an error
+        self.outcomes = {}
+        self.elapsed = None  # Seconds until the answer (or the timeout)
+
+    def solve(self):
+        start = time.monotonic()
+        context = multiprocessing.get_context()
+        # Each entrant is keyed by the receiving end of its pipe: (name, process, deadline)
+        running = {}
+        try:
+            for name, solver_class in self.solvers.items():
+                budget = self.time_budgets.get(name)
+                deadline = min(
+                    (start + limit for limit in (budget, self.timeout) if limit is not None), default=None
+                )
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_run_entrant,
+                    args=(solver_class, self.board, self.node_budgets.get(name), self.stats is not None, sender),
+                    daemon=True,
+                )
+                process.start()
+                sender.close()  # Leave the child the only writer, so its death reads as EOF
+                running[receiver] = (name, process, deadline)
+
+            while running:
+                deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                for receiver in wait(list(running), timeout):
+                    name, process, _ = running.pop(receiver)
+                    try:
+                        outcome, board, counters = receiver.recv()
+                    except EOFError:
+                        outcome, board, counters = "error", None, None  # The process died without answering
+                    receiver.close()
+                    self.outcomes[name] = outcome
+                    if outcome in ("solved", "unsolvable"):
+                        self._finish(outcome, name, board, counters, start)
+                        return outcome == "solved"
+
+                # Drop the entrants whose budget ran out while waiting
+                now = time.monotonic()
+                for receiver, (name, process, deadline) in list(running.items()):
+                    if deadline is not None and now >= deadline:
+                        del running[receiver]
+                        process.terminate()
+                        receiver.close()
+                        budget = self.time_budgets.get(name)
+                        over_budget = budget is not None and (self.timeout is None or budget < self.timeout)
+                        self.outcomes[name] = "time budget" if over_budget else "timeout"
+
+            # No answer: out of time if any solver ran over a budget, else every one failed
+            stopped = any(outcome in ("time budget", "node budget", "timeout") for outcome in self.outcomes.values())
+            self._finish("timeout" if stopped else "error", None, None, None, start)
+            return False
+        finally:
+            # Cancel every solver still running, whether another one won or the caller gave up
+            for receiver, (name, process, _) in running.items():
+                process.terminate()
+                receiver.close()
+                self.outcomes.setdefault(name, "cancelled")
+            for name, process, _ in running.values():
+                process.join()
+
+    def _finish(self, status, winner, board, counters, start):
+        self.status = status
+        self.winner = winner
+        self.elapsed = time.monotonic() - start
+        if board is not None:
+            for row, values in zip(self.board, board):
+                row[:] = values
+        if counters is not None and self.stats is not None:
+            for name in _SUMMED:
+                setattr(self.stats, name, getattr(self.stats, name) + counters[name])
+            self.stats.max_depth = max(self.stats.max_depth, counters["max_depth"])
+
+
+# Body of an entrant's process: solve and send (outcome, solved board, SearchStats counters) back
+def _run_entrant(solver_class, board, node_budget, want_stats, sender):
+    stats = None
+    if node_budget is not None or want_stats:
+        def check_budget(solver, depth):
+            if stats.nodes > node_budget:
+                raise NodeBudgetExceeded
+
+        stats = SearchStats(on_node=None if node_budget is None else check_budget)
+    try:
+        if stats is None:
+            solved = solver_class(board).solve()
+        else:
+            solved = solver_class(board, stats=stats).solve()
+    except NodeBudgetExceeded:
+        sender.send(("node budget", None, None))
+    except Exception as error:
+        sender.send((f"error: {error!r}", None, None))
+    else:
+        counters = None
+        if stats is not None:
+            counters = {name: getattr(stats, name) for name in _SUMMED + ("max_depth",)}
+        sender.send(("solved" if solved else "unsolvable", board if solved else None, counters))
+    finally:
+        sender.close()
@@ -0,0 +1,190 @@
+from collections import deque
+from functools import partial
+from itertools import combinations
+
+
+class PropagationEngine:
+    """
+    Propagates a CandidateBoard's candidate masks with a set of inference rules.
+
+    Work is driven by a queue of changed units: removing candidates from a cell queues its row,
+    column and box, and each queued unit is handed to every enabled rule in turn until the queue
+    runs dry. Removals go through the grid's trail, so the caller undoes them with grid.undo(mark).
+    A rule is a function rule(engine, unit) -> bool that returns False on a contradiction.
+    """
+
+    def __init__(self, grid, rules=None):
+        self.grid = grid
+        self.candidates = grid.candidates
+        self.count = grid.count
+        self.units = grid.index.units
+        self.units_of = grid.index.units_of
+        # Naked singles are the Sudoku rule itself (a digit appears once per unit), so they always run
+        names = set(DEFAULT_RULES if rules is None else rules) | {"naked_singles"}
+        unknown = names - set(RULES)
+        if unknown:
+            raise ValueError(f"unknown inference rules: {', '.join(sorted(unknown))}")
+        self.rules = [rule for name, rule in RULES.items() if name in names]
+        self.queue = deque()
+        self.queued = [False] * len(self.units)
+
+    # Remove the digits in bits (all present in cell i) and queue the cell's units; False on a wipeout
+    def remove(self, i, bits):
+        self.grid.remove(i, bits)
+        if not self.candidates[i]:
+            return False
+        queued = self.queued
+        for unit in self.units_of[i]:
+            if not queued[unit]:
+                queued[unit] = True
+                self.queue.append(unit)
+        return True
+
+    # Narrow cell i down to num, as a search branch does
+    def assign(self, i, num):
+        others = self.candidates[i] & ~self.grid.bit[num]
+        return not others or self.remove(i, others)
+
+    def propagate(self, units=None):
+        """Run the rules over the given unit numbers (default: every unit) and all units they change."""
+        queue, queued = self.queue, self.queued
+        for unit in range(len(self.units)) if units is None else units:
+            if not queued[unit]:
+                queued[unit] = True
+                queue.append(unit)
+
+        while queue:
+            unit = queue.popleft()
+            queued[unit] = False
+            cells = self.units[unit]
+            for rule in self.rules:
+                if not rule(self, cells):
+                    # Leave the queue empty for the next propagation after the caller undoes
+                    while queue:
+                        queued[queue.pop()] = False
+                    return False
+        return True
+
+
+def naked_singles(engine, unit):
+    """A cell down to one digit takes it out of every other cell in the unit."""
+    candidates, count = engine.candidates, engine.count
+    singles = 0
+    for i in unit:
+        bits = candidates[i]
+        if count[bits] == 1:
+            if singles & bits:
+                return False  # Two cells left holding the same digit
+            singles |= bits
+    for i in unit:
+        bits = candidates[i]
+        if bits & singles and count[bits] > 1:
+            if not engine.remove(i, bits & singles):
+                return False
+    return True
+
+
+def hidden_singles(engine, unit):
+    """A digit with one cell left in the unit must go there."""
+    candidates, count = engine.candidates, engine.count
+    once = twice = 0
+    for i in unit:
+        bits = candidates[i]
+        twice |= once & bits
+        once |= bits
+    if once != engine.grid.all_digits:
+        return False  # Some digit has nowhere left to go
+    single = once & ~twice
+    if single:
+        for i in unit:
+            bits = candidates[i] & single
+            if bits and bits != candidates[i]:
+                if count[bits] > 1:
+                    return False  # One cell is the only place for two digits
+                if not engine.remove(i, candidates[i] ^ bits):
+                    return False
+    return True
+
+
+def naked_subsets(engine, unit, size):
+    """`size` cells whose candidates together hold `size` digits take those digits out of the rest of the unit."""
+    candidates, count = engine.candidates, engine.count
+    open_cells = [i for i in unit if 1 < count[candidates[i]] <= size]
+    for subset in combinations(open_cells, size):
+        digits = 0
+        for i in subset:
+            digits |= candidates[i]
+        if count[digits] != size:
+            continue
+        for i in unit:
+            bits = candidates[i] & digits
+            if bits and i not in subset:
+                if not engine.remove(i, bits):
+                    return False
+    return True
+
+
+def hidden_subsets(engine, unit, size):
+    """`size` digits confined to the same `size` cells of the unit clear every other digit from those cells."""
+    candidates, bit = engine.candidates, engine.grid.bit
+    # places[d] is a mask over the unit's positions of the cells still holding d
+    places = {}
+    for d in range(1, engine.grid.size + 1):
+        mask = 0
+        for position, i in enumerate(unit):
+            if candidates[i] & bit[d]:
+                mask |= 1 << position
+        if 1 < bin(mask).count("1") <= size:
+            places[d] = mask
+    for subset in combinations(places, size):
+        positions = 0
+        for d in subset:
+            positions |= places[d]
+        if bin(positions).count("1") != size:
+            continue
+        digits = 0
+        for d in subset:
+            digits |= bit[d]
+        for position, i in enumerate(unit):
+            extra = candidates[i] & ~digits
+            if positions >> position & 1 and extra:
+                if not engine.remove(i, extra):
+                    return False
+    return True
+
+
+def pointing(engine, unit):
+    """
+    Pointing and box-line reduction: when every cell of the unit holding a digit also lies in one
+    other unit (a box's digit in one row or column, or a line's digit in one box), that digit
+    is cleared from the rest of the other unit.
+    """
+    candidates, bit, units, units_of = engine.candidates, engine.grid.bit, engine.units, engine.units_of
+    for d in range(1, engine.grid.size + 1):
+        b = bit[d]
+        holders = [i for i in unit if candidates[i] & b]
+        if len(holders) < 2:
+            continue  # Singles are left to the other rules
+        shared = set(units_of[holders[0]])
+        for i in holders[1:]:
+            shared.intersection_update(units_of[i])
+        for other in shared:
+            for i in units[other]:
+                if candidates[i] & b and i not in holders:
+                    if not engine.remove(i, b):
+                        return False
+    return True
+
+
+# Rules by name, in the order they run; a solver can enable any subset of them
+RULES = {
+    "naked_singles": naked_singles,
+    "hidden_singles": hidden_singles,
+    "naked_pairs": partial(naked_subsets, size=2),
+    "hidden_pairs": partial(hidden_subsets, size=2),
+    "pointing": pointing,
+    "naked_triples": partial(naked_subsets, size=3),
+    "hidden_triples": partial(hidden_subsets, size=3),
+}
+
+DEFAULT_RULES = ("naked_singles", "hidden_singles")
@@ -0,0 +1,105 @@
+import time
+
+# Token slot of a branch frame with no value applied
+_IDLE = object()
+
+
+class SearchState:
+    """
+    A depth-first search driven by an explicit stack, so it can stop after any number of nodes
+    and carry on later from exactly where it stopped, at any depth without recursing.
+
+    The solver describes its search tree through these methods:
+      _start()                  initial propagation; False when the puzzle is already contradictory
+      _branch()                 None at a complete assignment, else (key, values) to try in turn
+      _try(key, value)          apply one value, returning (ok, token); not ok is a dead end
+      _undo(key, value, token)  revert a _try, whether it succeeded or not
+      _leave(key)               every value of the branch has been tried
+      _backjump(key, depth)     optional: after _leave, how many branch points to keep (at most
+                                depth); the values of those beyond are undone without trying the
+                                rest, for solvers that know the failure did not depend on them
+    The solver's stats, when set, count a node per branch point and a backtrack per undone value,
+    with the depth of the branch point, as the recursive searches did.
+    """
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.stack = []  # Frames [key, iterator over the values, value applied, its undo token]
+        self.expand = True  # Whether the next step opens a node rather than moving to the next value
+        self.status = "ready"  # Then "paused", "solution", "exhausted" or "closed"
+        self.steps = 0  # Nodes opened so far
+
+    def run(self, steps=None, deadline=None):
+        """
+        Search on until the next solution (returns True), the end of the tree (False), or until
+        `steps` more nodes have been opened or time.monotonic() passes `deadline` (None, paused).
+        After a solution the solver's state is that solution; the next run backtracks out of it.
+        """
+        solver, stack, stats = self.solver, self.stack, self.solver.stats
+        backjump = getattr(solver, "_backjump", None)
+        if self.status in ("exhausted", "closed"):
+            return False
+        if self.status == "ready" and not solver._start():
+            self.status = "exhausted"
+            return False
+
+        limit = None if steps is None else self.steps + steps
+        bounded = limit is not None or deadline is not None
+        while True:
+            if self.expand:
+                if bounded and (
+                    limit is not None and self.steps >= limit or deadline is not None and time.monotonic() >= deadline
+                ):
+                    self.status = "paused"
+                    return None
+                self.steps += 1
+                if stats is not None:
+                    stats.node(solver, len(stack))
+                self.expand = False
+                branch = solver._branch()
+                if branch is None:
+                    self.status = "solution"
+                    return True
+                stack.append([branch[0], iter(branch[1]), None, _IDLE])
+
+            if not stack:
+                self.status = "exhausted"
+                return False
+            # Move the deepest branch on to its next value, undoing the one tried before
+            frame = stack[-1]
+            key, values = frame[0], frame[1]
+            if frame[3] is not _IDLE:
+                solver._undo(key, frame[2], frame[3])
+                frame[3] = _IDLE
+                if stats is not None:
+                    stats.backtrack(solver, len(stack) - 1)
+            for value in values:
+                ok, token = solver._try(key, value)
+                if ok:
+                    frame[2], frame[3] = value, token
+                    self.expand = True
+                    break
+                solver._undo(key, value, token)
+                if stats is not None:
+                    stats.backtrack(solver, len(stack) - 1)
+            else:
+                stack.pop()
+                solver._leave(key)
+                if backjump is not None:
+                    depth = backjump(key, len(stack))
+                    while len(stack) > depth:
+                        key, _, value, token = stack.pop()
+                        solver._undo(key, value, token)
+                        solver._leave(key)
+                        if stats is not None:
+                            stats.backjump(solver, len(stack))
+
+    def close(self):
+        """Undo every value still applied, leaving the solver as it was after _start()."""
+        stack, solver = self.stack, self.solver
+        while stack:
+            key, _, value, token = stack.pop()
+            if token is not _IDLE:
+                solver._undo(key, value, token)
+            solver._leave(key)
+        self.status = "closed"
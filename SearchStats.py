@@ -0,0 +1,87 @@
+import time
+
+
+class SearchStats:
+    """
+    Counters collected by a solver or generator when one is passed in as `stats`.
+
+    Solvers only touch these behind an `if stats is not None` check, so leaving stats off
+    costs one comparison per node. `on_node(solver, depth)` and `on_backtrack(solver, depth)`
+    are optional hooks called at every search node and every undone assignment. Backjumps
+    count the branch points a backjumping solver skipped without trying their other values.
+    """
+
+    def __init__(self, on_node=None, on_backtrack=None):
+        self.on_node = on_node
+        self.on_backtrack = on_backtrack
+        self.nodes = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.propagations = 0
+        self.pruned = 0
+        self.max_depth = 0
+        self.propagation_time = 0.0
+        self.total_time = 0.0
+        self._running = False
+
+    def node(self, solver, depth):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.on_node is not None:
+            self.on_node(solver, depth)
+
+    def backtrack(self, solver, depth):
+        self.backtracks += 1
+        if self.on_backtrack is not None:
+            self.on_backtrack(solver, depth)
+
+    def backjump(self, solver, depth):
+        self.backjumps += 1
+        if self.on_backtrack is not None:
+            self.on_backtrack(solver, depth)
+
+    def propagate(self, grid, propagate, *args):
+        """Run one propagation pass, timing it and counting the values it pruned from grid's trail."""
+        mark = len(grid.trail)
+        start = time.perf_counter()
+        result = propagate(*args)
+        self.propagation_time += time.perf_counter() - start
+        self.propagations += 1
+        self.pruned += sum(grid.count[bits] for _, bits in grid.trail[mark:])
+        return result
+
+    def run(self, solve):
+        """Call solve() and add its wall-clock time to total_time, once even when runs nest."""
+        if self._running:
+            return solve()
+        self._running = True
+        start = time.perf_counter()
+        try:
+            return solve()
+        finally:
+            self._running = False
+            self.total_time += time.perf_counter() - start
+
+    @property
+    def search_time(self):
+        return self.total_time - self.propagation_time
+
+    def as_dict(self):
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "backjumps": self.backjumps,
+            "propagations": self.propagations,
+            "pruned": self.pruned,
+            "max_depth": self.max_depth,
+            "propagation_time": self.propagation_time,
+            "search_time": self.search_time,
+            "total_time": self.total_time,
+        }
+
+    def __str__(self):
+        return "\n".join(
+            f"{name:>16}: {value:.6f} s" if isinstance(value, float) else f"{name:>16}: {value}"
+            for name, value in self.as_dict().items()
+        )
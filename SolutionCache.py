@@ -0,0 +1,161 @@
+import sqlite3
+from collections import OrderedDict
+from functools import partial
+
+from batch import format_puzzle, parse_puzzle
+from canonical import canonical_form
+
+# Stored in place of a solution for puzzles the solver proved unsolvable, so they are not retried
+UNSOLVABLE = ""
+
+
+class SolutionCache:
+    """
+    Solutions keyed by the canonical form of their puzzle, so a puzzle seen before under any
+    relabelling, transposition or row/column shuffle is answered without solving.
+
+    The most recently used `capacity` entries are kept in memory. With a `path`, every solution
+    is also written to a SQLite file there, which outlives the process and is shared by every
+    process opening the same path; memory misses fall back to it. Counters are per process.
+    """
+
+    def __init__(self, capacity=4096, path=None):
+        self.capacity = capacity
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0  # Puzzles solved without the cache, too symmetric to canonicalise cheaply
+        self._db = None
+
+    def _store(self):
+        if self._db is None:
+            # WAL lets worker processes read while another one writes
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions (puzzle TEXT PRIMARY KEY, solution TEXT NOT NULL)")
+        return self._db
+
+    def _remember(self, key, solution):
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        """The solution line cached for a canonical key, UNSOLVABLE, or None on a miss."""
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return solution
+        if self.path is not None:
+            row = self._store().execute("SELECT solution FROM solutions WHERE puzzle = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key, solution):
+        self._remember(key, solution)
+        if self.path is not None:
+            self._store().execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)", (key, solution))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __reduce__(self):
+        # A worker process gets one cache per (capacity, path) however many tasks carry it over,
+        # so its memory entries survive from one chunk to the next
+        return _process_cache, (self.capacity, self.path)
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def as_dict(self):
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hit_rate,
+            "entries": len(self.entries),
+        }
+
+    def __str__(self):
+        return "\n".join(
+            f"{name:>16}: {value:.1%}" if isinstance(value, float) else f"{name:>16}: {value}"
+            for name, value in self.as_dict().items()
+        )
+
+
+_process_caches = {}
+
+
+def _process_cache(capacity, path):
+    key = (capacity, path)
+    if key not in _process_caches:
+        _process_caches[key] = SolutionCache(capacity, path)
+    return _process_caches[key]
+
+
+class CachedSolver:
+    """
+    A solver answering from a SolutionCache before falling back on solver_class.
+
+    cached(solver_class, cache) builds a drop-in replacement for solver_class: constructed from a
+    board (and optional stats), solve() returns whether the puzzle has a solution and writes it into
+    the board. A miss solves the canonical puzzle, so its solution serves the whole symmetry class.
+    Puzzles canonical_form gives up on, such as a nearly empty board, are solved directly, uncached.
+    """
+
+    def __init__(self, solver_class, cache, board, stats=None):
+        self.solver_class = solver_class
+        self.cache = cache
+        self.board = board
+        self.stats = stats
+
+    def solve(self):
+        canonical = canonical_form(self.board)
+        if canonical is None:
+            self.cache.bypassed += 1
+            if self.stats is None:
+                return self.solver_class(self.board).solve()
+            return self.solver_class(self.board, stats=self.stats).solve()
+        key, transform = canonical
+        solution = self.cache.get(key)
+        if solution is None:
+            canonical = parse_puzzle(key)
+            if self.stats is None:
+                solved = self.solver_class(canonical).solve()
+            else:
+                solved = self.solver_class(canonical, stats=self.stats).solve()
+            solution = format_puzzle(canonical) if solved else UNSOLVABLE
+            self.cache.put(key, solution)
+        if solution == UNSOLVABLE:
+            return False
+
+        for row, values in zip(self.board, transform.restore(parse_puzzle(solution))):
+            row[:] = values
+        return True
+
+
+def cached(solver_class, cache):
+    """A solver class like solver_class that looks every puzzle up in cache first; picklable for the pool."""
+    return partial(CachedSolver, solver_class, cache)
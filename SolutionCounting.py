@@ -0,0 +1,100 @@
+from SearchState import SearchState
+
+
+class SolutionCounting:
+    """
+    Mixin running a solver's search through a SearchState and counting its solutions.
+
+    The solver sets `board`, its CandidateBoard `grid` and `stats`, and describes its search tree
+    with `_start()`, `_branch()`, `_try()` and `_undo()` (see SearchState). `_solve()` walks the
+    tree and calls `self._found()` at every complete assignment, stopping when that returns True.
+    `solve()` stops at the first solution and writes it into the board, after
+    `_record_solution()` for solvers that search on other structures; `count_solutions()`
+    keeps backtracking into further branches, reusing the propagation state the search undoes
+    anyway, until the limit is reached. `search()` hands out the SearchState itself, to run in
+    slices, `solve_until()` holds a solve to a deadline and `solutions()` streams every solution.
+    """
+
+    limit = 1
+    solutions_found = 0
+
+    def _start(self):
+        return True
+
+    def _leave(self, key):
+        pass
+
+    # Complete the grid's cells from the search state at a solution, for solvers that search on other structures
+    def _record_solution(self):
+        pass
+
+    def solve(self):
+        if not self.grid.consistent:
+            return False  # Givens already break a row, column or box
+        if self.stats is None:
+            solved = self._solve()
+        else:
+            solved = self.stats.run(self._solve)
+        if solved:
+            self._record_solution()
+            self.grid.write_back(self.board)
+        return solved
+
+    def _solve(self):
+        state = SearchState(self)
+        while state.run():
+            if self._found():
+                return True
+        return False
+
+    def _found(self):
+        self.solutions_found += 1
+        return self.solutions_found >= self.limit
+
+    def count_solutions(self, limit=2):
+        """Count the puzzle's solutions, stopping at `limit`. Call on a fresh solver; the board is not modified."""
+        if not self.grid.consistent:
+            return 0
+        self.limit = limit
+        self.solutions_found = 0
+        if self.stats is None:
+            self._solve()
+        else:
+            self.stats.run(self._solve)
+        return self.solutions_found
+
+    def is_unique(self):
+        """True when the puzzle has exactly one solution."""
+        return self.count_solutions(limit=2) == 1
+
+    def search(self):
+        """
+        A paused SearchState over the puzzle: run(steps) advances it by at most `steps` nodes,
+        so many searches can be interleaved or held to a deadline. Call on a fresh solver.
+        """
+        state = SearchState(self)
+        if not self.grid.consistent:
+            state.status = "exhausted"  # Givens already break a row, column or box
+        return state
+
+    def solve_until(self, deadline):
+        """
+        Like solve(), but give up once time.monotonic() passes `deadline`: returns None then and
+        leaves the board as it was. Call on a fresh solver.
+        """
+        found = self.search().run(deadline=deadline)
+        if found:
+            self._record_solution()
+            self.grid.write_back(self.board)
+        return found
+
+    def solutions(self):
+        """Lazily yield every solution as a new list of lists. Call on a fresh solver; the board is not modified."""
+        if not self.grid.consistent:
+            return
+        state = SearchState(self)
+        size = self.grid.size
+        while state.run():
+            self._record_solution()
+            cells = self.grid.cells
+            yield [cells[row * size:row * size + size] for row in range(size)]
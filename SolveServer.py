@@ -0,0 +1,460 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from Board import Board
+from batch import solve_lines
+
+# Claim flags shared with the workers, one per request key modulo this; far more than can be in flight at once
+CLAIM_SLOTS = 1 << 16
+
+# Upper bounds of the latency histogram buckets in milliseconds; a last bucket takes the rest
+LATENCY_BOUNDS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Counts of latencies in fixed buckets (LATENCY_BOUNDS_MS), cheap enough to record every request."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect_left(LATENCY_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the maximum for the last bucket)."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BOUNDS_MS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BOUNDS_MS, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+class SolveServer:
+    """
+    A long-running solving service speaking JSON lines over TCP or a Unix socket.
+
+    Each request line is an object such as {"id": 1, "solver": "DLX", "puzzle": "...", "timeout": 0.5}
+    and gets one response line with the same "id" and a "status" of "solved" (with "solution"),
+    "unsolvable", "timeout", "rejected" (the queue is full) or "error". {"op": "metrics"} returns
+    the metrics instead. Responses on a connection come back as they complete, not in order.
+
+    `solvers` maps the names a request may give to solver classes, as sudoku.py's solver_classes.
+    Requests wait in a queue of at most `queue_size` and are solved in batches, one task in a warm
+    process pool per batch and at most one batch per worker at a time. While other workers are
+    idle, the queued requests are shared out between them, one batch each; only when every other
+    worker is busy does the dispatcher take up to `max_batch` requests arriving within
+    `batch_window` seconds of each other, so requests pile up into larger batches exactly when
+    the workers are busy. Workers send each request's result back as soon as it is solved, not
+    with the rest of its batch, and claim each request before solving it: a worker left idle with
+    nothing queued takes the last request not yet claimed off a batch still running, so a quick
+    request does not wait behind a slow one sent in the same batch. A request's timeout (or
+    `default_timeout`) counts from its arrival: it is dropped if still queued at its deadline, and
+    solvers with solve_until() stop searching there. A pool broken by a dying worker fails its
+    batches and is replaced.
+    """
+
+    def __init__(
+        self, solvers, workers=None, max_batch=32, batch_window=0.002, queue_size=1024, default_solver="DLX",
+        default_timeout=None,
+    ):
+        self.solvers = dict(solvers)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.queue_size = queue_size
+        self.default_solver = default_solver
+        self.default_timeout = default_timeout
+        self.executor = None
+        self.queue = None
+        self.servers = []
+        self.results = None  # Queue the workers put (key, result) on as each request is solved
+        self.pending = {}  # Key -> future of each request sent to the workers and not answered yet
+        self.claims = None  # Array of CLAIM_SLOTS flags, set by the worker that takes each request
+        self.running = {}  # Task -> (executor, [(key, solver_class, puzzle, deadline)]) of each batch being solved
+        self._keys = 0
+
+        # Metrics
+        self.latency = LatencyHistogram()  # From arrival to response, every request
+        self.solver_latency = {}  # The same per solver name
+        self.queue_wait = LatencyHistogram()  # From arrival until sent to a worker
+        self.statuses = {}  # Responses by status
+        self.batches = 0
+        self.batched = 0  # Requests sent to the workers
+        self.stolen = 0  # Requests an idle worker took off a running batch
+        self.busy = 0  # Workers solving a batch
+        self.pools = 0  # Process pools started, more than one when workers died
+        self.max_queue_depth = 0
+        self.started = None
+
+    async def start(self, host="127.0.0.1", port=8642, path=None):
+        """Start the worker pool and the dispatcher and listen on a Unix socket at `path`, else on host:port."""
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            self._start_pool()
+            self.queue = asyncio.Queue(self.queue_size)
+            self._slots = asyncio.Semaphore(self.workers)
+            self._dispatcher = asyncio.create_task(self._dispatch())
+            self.started = time.monotonic()
+            # Start every worker and import the solver modules now rather than on the first requests
+            await asyncio.gather(
+                *(loop.run_in_executor(self.executor, _warm, self.solvers) for _ in range(self.workers))
+            )
+        if path is not None:
+            server = await asyncio.start_unix_server(self._connection, path)
+        else:
+            server = await asyncio.start_server(self._connection, host, port)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.executor is not None:
+            self._dispatcher.cancel()
+            self._stop_pool()
+            self.executor = None
+
+    def _start_pool(self):
+        # Each pool gets its own results queue and claims: a worker killed while writing or holding
+        # the claims' lock may leave them unusable
+        self.results = multiprocessing.Queue()
+        self.claims = multiprocessing.Array("b", CLAIM_SLOTS)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.results, self.claims)
+        )
+        self._collector = asyncio.create_task(self._collect(self.results))
+        self.pools += 1
+
+    def _stop_pool(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.results.put(None)  # Wakes the collector's reader thread so it can finish
+        self._collector.cancel()
+
+    async def _collect(self, results):
+        # Answer each request as its worker sends the result, ahead of the rest of the batch
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, results.get)
+            if item is None:
+                return
+            key, result = item
+            future = self.pending.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def _connection(self, reader, writer):
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def respond(line):
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            response = await self.handle(request)
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        except (ConnectionError, ValueError):
+            pass  # The client went away, or sent a line over the stream limit
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+    async def handle(self, request):
+        """Answer one decoded request object with a response object; also usable without a socket."""
+        if not isinstance(request, dict):
+            return self._respond(None, None, "error", time.monotonic(), error="expected a JSON object per line")
+        if request.get("op") == "metrics":
+            return {"id": request.get("id"), "metrics": self.metrics()}
+
+        arrived = time.monotonic()
+        name = request.get("solver", self.default_solver)
+        if not isinstance(name, str) or name not in self.solvers:
+            return self._respond(request, None, "error", arrived, error=f"unknown solver {name!r}")
+        puzzle = request.get("puzzle")
+        if not isinstance(puzzle, str):
+            return self._respond(request, name, "error", arrived, error="expected a puzzle line")
+        timeout = request.get("timeout", self.default_timeout)
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))):
+            return self._respond(request, name, "error", arrived, error="expected a timeout in seconds")
+        deadline = None if timeout is None else arrived + timeout
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((self.solvers[name], puzzle, arrived, deadline, future))
+        except asyncio.QueueFull:
+            return self._respond(request, name, "rejected", arrived, error="queue full")
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+        try:
+            status, result = await asyncio.wait_for(future, None if deadline is None else deadline - arrived)
+        except asyncio.TimeoutError:
+            status, result = "timeout", None
+        if status == "solved":
+            return self._respond(request, name, status, arrived, solution=result)
+        return self._respond(request, name, status, arrived, error=result)
+
+    def _respond(self, request, name, status, arrived, **fields):
+        ms = (time.monotonic() - arrived) * 1000
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.add(ms)
+        if name is not None:
+            self.solver_latency.setdefault(name, LatencyHistogram()).add(ms)
+        response = {"id": None if request is None else request.get("id"), "status": status, "ms": round(ms, 3)}
+        response.update((key, value) for key, value in fields.items() if value is not None)
+        return response
+
+    async def _dispatch(self):
+        # Form a batch whenever a worker is free, starting with the first request to arrive
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            if self.queue.empty() and self._steal():
+                continue
+            batch = [await self.queue.get()]
+            idle = self.workers - self.busy  # This worker included
+            if idle > 1:
+                # Other workers are idle too: take this worker's share of the queue and send it at once
+                share = min(self.max_batch, -(-(len(batch) + self.queue.qsize()) // idle))
+                while len(batch) < share:
+                    batch.append(self.queue.get_nowait())
+            else:
+                # Every other worker is busy: grow the batch with whatever else arrives in the window
+                closes = loop.time() + self.batch_window
+                while len(batch) < self.max_batch:
+                    if self.queue.empty():
+                        remaining = closes - loop.time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        batch.append(self.queue.get_nowait())
+
+            # Requests whose deadline passed in the queue, or whose caller stopped waiting, are not sent
+            now = time.monotonic()
+            live = []
+            for item in batch:
+                if item[4].done():
+                    continue
+                if item[3] is not None and item[3] <= now:
+                    item[4].set_result(("timeout", None))
+                else:
+                    live.append(item)
+            if not live:
+                self._slots.release()
+                continue
+            for item in live:
+                self.queue_wait.add((now - item[2]) * 1000)
+            self.batches += 1
+            self.batched += len(live)
+            claims = self.claims.get_obj()
+            items = []
+            for solver_class, puzzle, _, deadline, future in live:
+                self._keys += 1
+                self.pending[self._keys] = future
+                claims[self._keys % CLAIM_SLOTS] = 0
+                items.append((self._keys, solver_class, puzzle, deadline))
+            self._submit(items)
+
+    def _steal(self):
+        # An idle worker takes the last unclaimed request off the running batch with the most of them
+        claims = self.claims.get_obj()
+        best = []
+        for executor, items in self.running.values():
+            if executor is not self.executor:
+                continue
+            waiting = [item for item in items if item[0] in self.pending]
+            unclaimed = [item for item in waiting if not claims[item[0] % CLAIM_SLOTS]]
+            # A batch's only waiting request is left to its own worker
+            if len(waiting) > 1 and len(unclaimed) > len(best):
+                best = unclaimed
+        if not best:
+            return False
+        for executor, items in self.running.values():
+            if best[-1] in items:
+                items.remove(best[-1])  # Stolen once: the request's new batch holds it now
+        self.stolen += 1
+        self._submit([best[-1]])
+        return True
+
+    def _submit(self, items):
+        # Send (key, solver_class, puzzle, deadline) items to a worker as one task
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        self.busy += 1
+        requests = [
+            (key, solver_class, puzzle, None if deadline is None else deadline - now)
+            for key, solver_class, puzzle, deadline in items
+        ]
+        executor = self.executor
+        try:
+            task = loop.run_in_executor(executor, solve_requests, requests)
+        except RuntimeError as error:  # The pool broke, a worker having died
+            task = loop.create_future()
+            task.set_exception(error)
+        self.running[task] = (executor, list(items))
+        task.add_done_callback(lambda task, requests=requests: self._finish(task, requests, executor))
+
+    def _finish(self, task, requests, executor):
+        self.busy -= 1
+        self._slots.release()
+        del self.running[task]
+        if task.cancelled():
+            results = [None] * len(requests)
+        elif task.exception() is not None:
+            error = task.exception()
+            results = [("error", repr(error))] * len(requests)
+            if isinstance(error, BrokenProcessPool) and executor is self.executor:
+                # Every later submit to a broken pool fails too: start a fresh one for the requests to come
+                self._stop_pool()
+                self._start_pool()
+        else:
+            results = task.result()
+        # Results the collector has not delivered yet, and every result of a failed batch; None stands
+        # for a request another worker claimed, whose result comes from that worker
+        for (key, *_), result in zip(requests, results):
+            if result is not None:
+                future = self.pending.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+
+    def metrics(self):
+        return {
+            "uptime_s": 0.0 if self.started is None else time.monotonic() - self.started,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "pools": self.pools,
+            "queue_depth": 0 if self.queue is None else self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "mean_batch": self.batched / self.batches if self.batches else 0.0,
+            "stolen": self.stolen,
+            "statuses": dict(self.statuses),
+            "latency": self.latency.as_dict(),
+            "queue_wait": self.queue_wait.as_dict(),
+            "solvers": {name: histogram.as_dict() for name, histogram in self.solver_latency.items()},
+        }
+
+
+# The worker's ends of SolveServer.results and SolveServer.claims, set when the pool starts the worker
+_results = None
+_claims = None
+
+
+def _init_worker(results, claims):
+    global _results, _claims
+    _results, _claims = results, claims
+
+
+# Run in each worker at start-up: unpickling the solver classes imports their modules
+def _warm(solvers):
+    return len(solvers)
+
+
+def solve_requests(requests):
+    """
+    Solve a batch of (key, solver_class, puzzle line, seconds left or None) in a worker process
+    and return (status, solution line or error message) for each, None for the requests another
+    worker claimed first. Each result is also put on the server's results queue as (key, result)
+    as soon as it is known. Batched solvers such as NumpyBatch go first, all of their puzzles in
+    one call, then the others one at a time.
+    """
+    start = time.monotonic()
+    results = [None] * len(requests)
+    batched = {}
+    for number, (key, solver_class, line, budget) in enumerate(requests):
+        if getattr(solver_class, "batched", False) and _claim(key):
+            batched.setdefault(solver_class, []).append(number)
+
+    for solver_class, numbers in batched.items():
+        solutions = solve_lines(solver_class, [requests[number][2] for number in numbers])
+        for number, solution in zip(numbers, solutions):
+            if isinstance(solution, ValueError):
+                results[number] = ("error", str(solution))
+            else:
+                results[number] = ("unsolvable", None) if solution is None else ("solved", solution)
+            _send(requests[number][0], results[number])
+
+    for number, (key, solver_class, line, budget) in enumerate(requests):
+        if not getattr(solver_class, "batched", False) and _claim(key):
+            results[number] = _solve_request(solver_class, line, None if budget is None else start + budget)
+            _send(key, results[number])
+    return results
+
+
+def _claim(key):
+    # Take the request unless another worker has: True when this worker is to solve it
+    if _claims is None:
+        return True
+    with _claims.get_lock():
+        claims = _claims.get_obj()
+        if claims[key % CLAIM_SLOTS]:
+            return False
+        claims[key % CLAIM_SLOTS] = 1
+        return True
+
+
+def _send(key, result):
+    if _results is not None:
+        _results.put((key, result))
+
+
+def _solve_request(solver_class, line, deadline):
+    if deadline is not None and time.monotonic() >= deadline:
+        return "timeout", None
+    try:
+        board = Board.from_line(line)
+    except ValueError as error:
+        return "error", str(error)
+    solver = solver_class(board)
+    if deadline is None or not hasattr(solver, "solve_until"):
+        solved = solver.solve()
+    else:
+        solved = solver.solve_until(deadline)
+        if solved is None:
+            return "timeout", None
+    return ("solved", board.to_line()) if solved else ("unsolvable", None)
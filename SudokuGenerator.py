@@ -1,82 +1,276 @@
 import random
+from Board import Board
+from CandidateBoard import CandidateBoard
+from DifficultyGrader import LEVELS, DifficultyGrader
+from SearchState import SearchState
+from SudokuIndex import board_index
+from validate import validate_grids
+
+# Removal patterns: each maps a cell of an N x N board to the group of cells blanked together with it
+SYMMETRIES = {
+    "none": lambda i, n: (i,),
+    "rotational": lambda i, n: (i, n * n - 1 - i),
+    "horizontal": lambda i, n: (i, (i // n) * n + n - 1 - i % n),
+    "vertical": lambda i, n: (i, (n - 1 - i // n) * n + i % n),
+    "diagonal": lambda i, n: (i, (i % n) * n + i // n),
+}
+
+# Clues left when no count is given. Larger boards keep a larger share: digging a 16x16 board
+# down to 30/81 of its cells takes minutes, and random removal leaves search-heavy puzzles.
+DEFAULT_CLUES = {4: 6, 9: 30, 16: 115, 25: 330}
+
+# Search nodes per cell a fill may use before the grid is abandoned for a fresh one
+FILL_BUDGET = 4
 
 class SudokuGenerator:
-    def __init__(self, solver_class):
-        self.board = [[0 for _ in range(9)] for _ in range(9)]
+    def __init__(self, solver_class, stats=None, seed=None, box=3):
+        # Boards are N x N with N = box * box: 9x9 by default, 16x16 for box 4, 25x25 for box 5
+        self.index = board_index(box * box)
+        self.size = self.index.size
+        self.board = [[0 for _ in range(self.size)] for _ in range(self.size)]
         self.solver_class = solver_class
+        # Private random stream, so a seeded generator reproduces its puzzles exactly
+        self.random = random.Random(seed)
+        self.stats = stats  # Optional SearchStats, shared with the solvers run on each candidate
+        self.candidates = 0  # Full grids drawn so far, accepted or not
+        self.grader = None  # The DifficultyGrader of the last puzzle generated for a difficulty band
+
+    def generate_and_test(self, clues=None, unique=False, symmetry="none", difficulty=None):
+        """
+        Generate grids until one is solvable by the provided solver.
+        With unique, clues are dug out of a full grid one symmetric group at a time (see _dig),
+        so the puzzle has exactly one solution; a fresh grid is only drawn when digging gets stuck.
+        Without a clue count, DEFAULT_CLUES for the board size are kept (30 on a 9x9 board).
 
-    def generate_and_test(self, clues=30):
-        """Generate grids until one is solvable by the provided solver."""
+        A `difficulty` band of (low, high) level names from DifficultyGrader.LEVELS implies unique
+        and keeps only puzzles whose grade falls in the band; without a clue count, clues are then
+        dug out as far as the band allows. A candidate is given up on as soon as it misses the band.
+        """
+        area = len(self.index.cells)
+        if difficulty is not None:
+            unique = True
+        elif clues is None:
+            clues = DEFAULT_CLUES.get(self.size, area // 2)
+        if (
+            unique and clues is not None and all(len(group) == 2 for group in self._groups(symmetry))
+            and (area - clues) % 2
+        ):
+            # Every cell is blanked together with its mirror image, so only an even number can go
+            raise ValueError(f"{symmetry} symmetry on a {self.size}x{self.size} board needs an even number of blanks")
         while True:
             # Generate a fresh board
-            self.board = [[0 for _ in range(9)] for _ in range(9)]
+            self.board = [[0 for _ in range(self.size)] for _ in range(self.size)]
             self._fill_diagonal_boxes()
-            self._fill_remaining(0, 3)
-            self._remove_numbers(81 - clues)
+            if not self._fill_remaining():
+                continue  # Unlucky early choices; a fresh grid is far cheaper than searching on
+            self.candidates += 1
+            if unique:
+                if not self._dig(clues, symmetry, difficulty):
+                    continue  # Every remaining removal broke uniqueness before reaching the target
+            else:
+                self._remove_numbers(area - clues)
+            if difficulty is not None:
+                # Digging kept the puzzle unique, so one solution is all the grader has to find
+                self.grader = DifficultyGrader(Board(self.board), band=difficulty)
+                self.grader.grade(limit=1)
+                if self.grader.missed:
+                    continue
 
-            # Make a copy of the unsolved board to pass to the solver
-            unsolved_board = [row[:] for row in self.board]
-            solver = self.solver_class(unsolved_board)
+            # Make a compact copy of the unsolved board to pass to the solver
+            unsolved_board = Board(self.board)
+            if self.stats is None:
+                solver = self.solver_class(unsolved_board)
+            else:
+                solver = self.solver_class(unsolved_board, stats=self.stats)
 
             # Check if the board is solvable
             if solver.solve() and self._is_solved(solver.board):
                 return self.board  # Return the unsolved grid if solvable
 
     def _fill_diagonal_boxes(self):
-        """Fills the diagonal 3x3 boxes, which don't affect each other."""
-        for i in range(0, 9, 3):
+        """Fills the diagonal boxes, which don't affect each other."""
+        for i in range(0, self.size, self.index.box):
             self._fill_box(i, i)
 
     def _fill_box(self, row, col):
-        """Fills a 3x3 box with unique values 1-9."""
-        nums = random.sample(range(1, 10), 9)
-        for i in range(3):
-            for j in range(3):
+        """Fills a box with unique values 1-N."""
+        box = self.index.box
+        nums = self.random.sample(range(1, self.size + 1), self.size)
+        for i in range(box):
+            for j in range(box):
                 self.board[row + i][col + j] = nums.pop()
 
-    def _fill_remaining(self, i, j):
-        """Uses backtracking to fill the remaining cells ensuring a valid Sudoku."""
-        if i == 9:
-            return True
-        if j == 9:
-            return self._fill_remaining(i + 1, 0)
-        if self.board[i][j] != 0:
-            return self._fill_remaining(i, j + 1)
-
-        for num in random.sample(range(1, 10), 9):
-            if self._is_safe(num, i, j):
-                self.board[i][j] = num
-                if self._fill_remaining(i, j + 1):
-                    return True
-                self.board[i][j] = 0  # Backtrack
-        return False
-
-    def _is_safe(self, num, row, col):
-        """Checks if it's safe to place a number in a specific cell."""
-        if num in self.board[row]:
+    def _fill_remaining(self):
+        """
+        Uses backtracking to fill the remaining cells ensuring a valid Sudoku, trying digits in
+        random order at the most constrained point (see _branch); row-major order stalls for minutes
+        on 16x16 boards. Returns False once the search exceeds its FILL_BUDGET: fill times are
+        heavy-tailed on 16x16 and 25x25 boards, and restarting cuts the tail off.
+        """
+        grid = CandidateBoard(self.board)
+        search = SearchState(_GridSearch(self, grid, shuffle=True))
+        if not search.run(steps=FILL_BUDGET * len(grid.cells)):
             return False
-        if num in [self.board[r][col] for r in range(9)]:
-            return False
-        box_start_row, box_start_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(box_start_row, box_start_row + 3):
-            for j in range(box_start_col, box_start_col + 3):
-                if self.board[i][j] == num:
-                    return False
+        grid.write_back(self.board)
         return True
 
+    def _branch(self, grid):
+        """
+        Picks where a fill or completion search branches, as (cell, digits to try).
+
+        A cell with one candidate, or a digit with one place left in some unit, is taken first, so
+        forced moves cost no branching; otherwise the cell with the fewest free digits. The digits
+        mask is 0 at a dead end and the cell None when the grid is full.
+        """
+        cells, free, count_of = grid.cells, grid.free, grid.count
+        masks = [0] * len(cells)
+        best, best_count = None, grid.size + 1
+        for i in self.index.cells:
+            if cells[i] == 0:
+                masks[i] = mask = free(i)
+                count = count_of[mask]
+                if count < best_count:
+                    best, best_count = i, count
+        if best is None:
+            return None, 0
+        if best_count <= 1:
+            return best, masks[best]
+
+        bit, all_digits = grid.bit, grid.all_digits
+        for unit in self.index.units:
+            once = twice = placed = 0
+            for i in unit:
+                mask = masks[i]
+                twice |= once & mask
+                once |= mask
+                placed |= bit[cells[i]]
+            if all_digits & ~placed & ~once:
+                return best, 0  # Some digit has nowhere left to go in this unit
+            single = once & ~twice
+            if single:
+                single &= -single
+                for i in unit:
+                    if masks[i] & single:
+                        return i, single
+        return best, masks[best]
+
     def _remove_numbers(self, num_cells):
         """Removes a specified number of cells to create a puzzle."""
         count = num_cells
         while count > 0:
-            row, col = random.randint(0, 8), random.randint(0, 8)
+            row, col = self.random.randint(0, self.size - 1), self.random.randint(0, self.size - 1)
             if self.board[row][col] != 0:
                 self.board[row][col] = 0
                 count -= 1
 
+    def _dig(self, clues, symmetry="none", difficulty=None):
+        """
+        Blank the full board down to `clues` clues, keeping the solution unique after every step.
+
+        Groups of cells from the symmetry pattern are removed in random order. The puzzle before a
+        removal is unique, so the new one stays unique unless some solution differs from the known
+        one in a just-blanked cell; that is checked directly on one CandidateBoard that is carried
+        from step to step, and a failing removal is put back instead of starting over.
+        Returns False when no further group can be removed before reaching the target.
+
+        With clues None every group that can go is removed. With a `difficulty` band that tops out
+        at singles, a removal is kept only when singles still solve the puzzle (see _solves_up_to),
+        which also proves it unique and is cheaper than the search. The rules of harder levels cost
+        more than the search, so other bands are dug for uniqueness and graded once at the end.
+        """
+        solution = [value for row in self.board for value in row]
+        grid = CandidateBoard(self.board)
+        size = self.size
+        groups = self._groups(symmetry)
+        self.random.shuffle(groups)
+
+        singles = difficulty is not None and difficulty[1] == LEVELS[0]
+        target = clues or 0
+        remaining = len(self.index.cells)
+        for group in groups:
+            if remaining == target:
+                break
+            if remaining - len(group) < target:
+                continue
+            for i in group:
+                grid.unplace(i)
+            if singles:
+                keep = self._solves_up_to(grid, LEVELS[0])
+            else:
+                keep = not any(self._has_other_solution(grid, i, solution[i]) for i in group)
+            if keep:
+                remaining -= len(group)
+            else:
+                for i in group:
+                    grid.place(i, solution[i])  # Undo just this removal
+
+        if clues is not None and remaining != clues:
+            return False
+        self.board = [grid.cells[row * size:row * size + size] for row in range(size)]
+        return True
+
+    def _solves_up_to(self, grid, level):
+        """Checks whether the inference rules up to `level` solve the grid's placed clues alone."""
+        size = self.size
+        board = [grid.cells[row * size:row * size + size] for row in range(size)]
+        grader = DifficultyGrader(board, band=(LEVELS[0], level))
+        grader.grade(limit=1)
+        return grader.missed is None
+
+    def _groups(self, symmetry):
+        """The cell groups of a symmetry pattern, each a sorted tuple, in a fixed order."""
+        return sorted({tuple(sorted(set(SYMMETRIES[symmetry](i, self.size)))) for i in self.index.cells})
+
+    def _has_other_solution(self, grid, cell, value):
+        """Checks whether the grid can be completed with something other than value in cell."""
+        for num in grid.digits[grid.free(cell) & ~grid.bit[value]]:
+            grid.place(cell, num)
+            found = self._complete(grid)
+            grid.unplace(cell)
+            if found:
+                return True
+        return False
+
+    def _complete(self, grid):
+        """Checks whether the grid has any completion, branching as _branch picks. The grid is left as it was found."""
+        search = SearchState(_GridSearch(self, grid))
+        found = search.run()
+        search.close()
+        return found
+
     def _is_solved(self, board):
-        """Check if the board is completely solved (no empty cells)."""
-        for row in range(9):
-            for col in range(9):
-                if board[row][col] == 0:
-                    return False
+        """Check that the board is a complete, valid solution that keeps every clue of the puzzle."""
+        valid, _ = validate_grids([board], [self.board])
+        return bool(valid[0])
+
+
+class _GridSearch:
+    """The search tree of completing a CandidateBoard as SudokuGenerator._branch picks, for a SearchState."""
+
+    def __init__(self, generator, grid, shuffle=False):
+        self.generator = generator
+        self.grid = grid
+        self.shuffle = shuffle  # Try digits in the generator's random order rather than ascending
+        self.stats = generator.stats
+
+    def _start(self):
         return True
+
+    def _branch(self):
+        cell, mask = self.generator._branch(self.grid)
+        if cell is None:
+            return None
+        digits = list(self.grid.digits[mask])
+        if self.shuffle:
+            self.generator.random.shuffle(digits)
+        return cell, digits
+
+    def _try(self, cell, num):
+        self.grid.place(cell, num)
+        return True, None
+
+    def _undo(self, cell, num, token):
+        self.grid.unplace(cell)  # Backtrack
+
+    def _leave(self, cell):
+        pass
@@ -0,0 +1,59 @@
+# Static index of the Sudoku structure, built once per board size.
+# Cells are addressed by flat index (row * N + col) in 0..N*N-1; every table is an immutable tuple.
+from functools import lru_cache
+from math import isqrt
+
+
+class SudokuIndex:
+    """Tables of an N x N board made of box x box boxes, so N == box * box."""
+
+    def __init__(self, box):
+        size = box * box
+        self.box = box
+        self.size = size
+        self.cells = tuple(range(size * size))
+
+        # Flat cell index to its row, column and box
+        self.row_of = tuple(i // size for i in self.cells)
+        self.col_of = tuple(i % size for i in self.cells)
+        self.box_of = tuple(box * (i // (size * box)) + (i % size) // box for i in self.cells)
+
+        # The 3N units: rows 0..N-1, then columns N..2N-1, then boxes 2N..3N-1
+        self.rows = tuple(tuple(i for i in self.cells if self.row_of[i] == r) for r in range(size))
+        self.cols = tuple(tuple(i for i in self.cells if self.col_of[i] == c) for c in range(size))
+        self.boxes = tuple(tuple(i for i in self.cells if self.box_of[i] == b) for b in range(size))
+        self.units = self.rows + self.cols + self.boxes
+
+        # units_of[i] holds the unit numbers (indices into units) of cell i's row, column and box
+        self.units_of = tuple(
+            (self.row_of[i], size + self.col_of[i], 2 * size + self.box_of[i]) for i in self.cells
+        )
+
+        # peers[i] holds the 3N - 2 box - 1 cells sharing a unit with cell i, in ascending order
+        self.peers = tuple(
+            tuple(sorted({j for u in self.units_of[i] for j in self.units[u]} - {i}))
+            for i in self.cells
+        )
+
+
+@lru_cache(maxsize=None)
+def board_index(size):
+    """The shared SudokuIndex of N x N boards; raises ValueError unless N is a perfect square."""
+    box = isqrt(size)
+    if size < 1 or box * box != size:
+        raise ValueError(f"board size must be a perfect square such as 4, 9, 16 or 25, got {size}")
+    return SudokuIndex(box)
+
+
+# The standard 9x9 board, re-exported as module constants
+STANDARD = board_index(9)
+CELLS = STANDARD.cells
+ROW_OF = STANDARD.row_of
+COL_OF = STANDARD.col_of
+BOX_OF = STANDARD.box_of
+ROWS = STANDARD.rows
+COLS = STANDARD.cols
+BOXES = STANDARD.boxes
+UNITS = STANDARD.units
+UNITS_OF = STANDARD.units_of
+PEERS = STANDARD.peers
@@ -0,0 +1,160 @@
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from Board import SYMBOLS, Board
+from SudokuGenerator import SudokuGenerator
+
+
+def parse_puzzle(line):
+    """
+    Parse a puzzle line into a list of lists: 81 characters for a 9x9 board, 256 for 16x16
+    or 625 for 25x25 (16 for 4x4), with '0' or '.' for blanks and letters for values above 9.
+    Board.from_line() parses into the compact Board instead.
+    """
+    return Board.from_line(line).tolist()
+
+
+def format_puzzle(board):
+    """Serialise a board (a list of lists or a Board) to the line format, 0 for blanks."""
+    if isinstance(board, Board):
+        return board.to_line()
+    return "".join(SYMBOLS[value] for row in board for value in row)
+
+
+def read_puzzles(stream, line_numbers=None):
+    """
+    Yield the puzzle lines of a text stream, skipping blank lines and '#' comments. With a dict
+    as `line_numbers`, the 1-based line number of each puzzle is stored under its 0-based index,
+    for the caller to pop once it is done with the puzzle.
+    """
+    index = 0
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            if line_numbers is not None:
+                line_numbers[index] = number
+            index += 1
+            yield line
+
+
+def solve_lines(solver_class, lines):
+    """
+    Solve each puzzle line and return the solution lines, None where a puzzle has no solution and
+    the ValueError where a line does not parse, so a malformed line only loses its own result.
+    """
+    solutions = []
+    boards = {}  # Board size -> [(position, board)], for batched solvers
+    for line in lines:
+        try:
+            board = Board.from_line(line)
+        except ValueError as error:
+            solutions.append(error)
+            continue
+        if getattr(solver_class, "batched", False):
+            boards.setdefault(board.size, []).append((len(solutions), board))
+            solutions.append(None)
+        else:
+            solutions.append(board.to_line() if solver_class(board).solve() else None)
+
+    # Batched solvers take each board size as one (count, N, N) array
+    for group in boards.values():
+        solver = solver_class([board for _, board in group])
+        solver.solve()
+        for (position, _), grid, solved in zip(group, solver.grids.tolist(), solver.solved):
+            solutions[position] = "".join(SYMBOLS[value] for value in grid) if solved else None
+    return solutions
+
+
+def _chunks(lines, size):
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_chunks(function, args, chunks, workers=None, ordered=True):
+    """
+    Call function(*args, chunk) for each chunk across a process pool, yielding (number, result).
+
+    At most a few chunks per worker are in flight, so arbitrarily long chunk streams are
+    consumed lazily. With `ordered` results come back in chunk order, otherwise as soon as
+    each chunk completes. A single worker runs in-process, sparing start-up and pickling.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = enumerate(chunks)
+
+    if workers == 1:
+        for number, chunk in chunks:
+            yield number, function(*args, chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(number, chunk):
+            return number, executor.submit(function, *args, chunk)
+
+        pending = deque(submit(number, chunk) for number, chunk in islice(chunks, workers * 4))
+        while pending:
+            if ordered:
+                number, future = pending.popleft()
+            else:
+                done = wait([future for _, future in pending], return_when=FIRST_COMPLETED).done
+                number, future = next(item for item in pending if item[1] in done)
+                pending.remove((number, future))
+
+            # Keep the pool busy before handing results back
+            pending.extend(submit(next_number, chunk) for next_number, chunk in islice(chunks, 1))
+            yield number, future.result()
+
+
+def solve_batch(solver_class, lines, workers=None, chunksize=64, ordered=True):
+    """
+    Solve a stream of puzzle lines across a process pool, yielding (index, solution) pairs.
+
+    Puzzles are sent to the workers in chunks of `chunksize`, so arbitrarily long inputs are
+    streamed rather than loaded. With `ordered` the results come back in input order, otherwise
+    as soon as each chunk completes. A solution is None when the solver found the puzzle unsolvable.
+    """
+    results = map_chunks(solve_lines, (solver_class,), _chunks(lines, chunksize), workers, ordered)
+    for number, solutions in results:
+        for offset, solution in enumerate(solutions):
+            yield number * chunksize + offset, solution
+
+
+def puzzle_seed(master_seed, index):
+    """Seed of the index-th puzzle of a run, so output depends only on the master seed, not on scheduling."""
+    return f"{master_seed}:{index}"
+
+
+def generate_puzzles(solver_class, box, clues, unique, symmetry, difficulty, master_seed, indices):
+    """Generate one puzzle line per index, each from its own seeded generator."""
+    return [
+        format_puzzle(
+            SudokuGenerator(solver_class, seed=puzzle_seed(master_seed, index), box=box).generate_and_test(
+                clues, unique, symmetry, difficulty
+            )
+        )
+        for index in indices
+    ]
+
+
+def generate_batch(
+    solver_class, count, clues=None, unique=False, symmetry="none", seed=0, workers=None, chunksize=16, box=3,
+    difficulty=None,
+):
+    """
+    Generate `count` puzzles across a process pool, yielding (index, puzzle line) in index order.
+    With a `difficulty` band of (low, high) level names every puzzle grades within it.
+
+    Puzzle i is generated from puzzle_seed(seed, i) alone, so a given master seed always yields
+    the same sequence whatever the worker count or chunk size.
+    """
+    chunks = (range(start, min(start + chunksize, count)) for start in range(0, count, chunksize))
+    args = (solver_class, box, clues, unique, symmetry, difficulty, seed)
+    results = map_chunks(generate_puzzles, args, chunks, workers)
+    for number, puzzles in results:
+        for offset, puzzle in enumerate(puzzles):
+            yield number * chunksize + offset, puzzle
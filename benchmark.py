@@ -0,0 +1,483 @@
+import json
+import platform
+import signal
+import statistics
+import time
+import tracemalloc
+
+from Board import Board
+from batch import parse_puzzle
+from DifficultyGrader import LEVELS, DifficultyGrader
+from SearchStats import SearchStats
+from SudokuGenerator import SudokuGenerator
+
+# Built-in corpora in the line format, 0 or . for blanks; every puzzle has a unique solution
+
+# The original mixed corpus of the first benchmark.py, kept so its figures can be reproduced
+DEFAULT_CORPUS = [
+    "000004090802970000901200300000049157013050920579120000007002603000038205020500000",
+    "003020600900305001001806400008102900700000008006708200002609500800203009005010300",
+    "200080300060070084030500209000105408000000000402706000301007040720040060004010003",
+    "000000907000420180000705026100904000050000040000507009920108000034059000507000000",
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+    "100000002090400050006000700050903000000070000000850040700000600030009080002000001",
+]
+
+# Puzzles that naked and hidden singles solve without search
+EASY_CORPUS = [
+    "140005230005000004000700900000512006060300000802000007020400783000800001300200500",
+    "002910700700040030090760080000050006000007000804390075040030010631009000270080003",
+    "700203009000010243380000607010000080200100094060009000000802001030040000920030060",
+    "002000095610205000004300600009050008005080163060000900006000709300000826498006501",
+    "063000000704082031800001476006700009495800007017400002041060028608009000500000000",
+    "000706009080100006000000500008400603054029000790000054030040107000000930075080000",
+    "100000050690030800000018000009070308007301200020000014080100007200000500065700082",
+    "000060002005000030090318040000007003080640070010009620007900010451020709200000000",
+    "002007000570238400000906250600000004050300002003000800000090600080540971000000045",
+    "000300060000510009312690005070400102204000006000089340048001020901000050537020600",
+    "000000578040300910500010000007900000081054000003080190000840030000160780096070400",
+    "780305900009020000010700080800100200903402800020009367000248030002900010090000005",
+    "006001000905003408417508060700320000563000902008405107004012005030700000000000001",
+    "000001400000002000000768930200174000030509060405003007350006000002890050891400670",
+    "060000009070001000000004080700100005090805306506403070015240000000500800600300702",
+    "000000050501807006900056300093400007010270090040391002020009048409000000008020000",
+    "400038700080071040000060039061804000009056000500097064010700983000000020050000000",
+    "007003084800605200000478300480050007570800010000004800900500040700006095603000008",
+    "000208964800401007006000020018000009090000080000030100680100700970620400040000692",
+    "840300005502010700106780032320009000000030160709100500015800094000020600200000300",
+    "001006000090080600000500200064750083570090002100800006000025060042900700900000000",
+    "006400000047030205000062001100000002300046000850901600720690830000000026080300000",
+    "000020139618030027000000004096004000300060800507000000950007046704050008061340900",
+    "000504000508700300029000050030601090400070003006000001800005900014208005000137000",
+]
+
+# Puzzles that need deep search from the solvers without strong inference
+HARD_CORPUS = [
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+    "100000002090400050006000700050903000000070000000850040700000600030009080002000001",
+    "..53.....8......2..7..1.5..4....53...1..7...6..32...8..6.5....9..4....3......97..",
+    "000000907000420180000705026100904000050000040000507009920108000034059000507000000",
+    "200080300060070084030500209000105408000000000402706000301007040720040060004010003",
+]
+
+# Minimal puzzles with 17 clues, the fewest a uniquely solvable Sudoku can have
+MINIMAL_CORPUS = [
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    "000000012000035000000600070700000300000400800100000000000120000080000040050000600",
+    "000000012003600000000007000410020000000500300700000600280000040000300500000000000",
+    "000000012008030000000000040120500000000004700060000000507000300000620000000100000",
+    "52...6.........7.13...........4..8..6......5...........418.........3..2...87.....",
+    "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....",
+    "48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....",
+]
+
+# Puzzles built against naive row-major backtracking: empty or near-empty top rows whose
+# solutions start 9, 8, 7, ... so ascending trial order is wrong as often as possible
+ADVERSARIAL_CORPUS = [
+    "000000000000003085001020000000507000004000100090000000500000073002010000000040009",
+    "000000020400000000010000000000030406005000700002080000700400100030200000000509000",
+    "000054000060000700010000000000900060805000000000000030700000504000020800000103000",
+    "....14....3....2...7..........9...3.6.1.............8.2.....1.4....5.6.....7.8...",
+]
+
+# Larger boards for the scaling benchmarks, one row per source line (1-9 then A-G or A-P)
+
+# 16x16 puzzles with 115 clues and a unique solution, from generate-batch --box 4 --unique --seed 16
+CORPUS_16X16 = [
+    (
+        "CEB01000600A0742"
+        "100070G000030605"
+        "0008009E701CG000"
+        "07G002B0004D00E0"
+        "000E098000004000"
+        "000AG640E9015D78"
+        "7080E5000D302090"
+        "00000010000000F0"
+        "0C00000GA698B000"
+        "0G043F0000E01009"
+        "0000BCA2G0040567"
+        "006000043C00A80E"
+        "2A05070308000904"
+        "80C0000103000A50"
+        "010G5BF900A70020"
+        "3007A000B0D9FC00"
+    ),
+    (
+        "203080005F90007E"
+        "0017A00CD3B00G00"
+        "000A00438000200F"
+        "800400F9200100B5"
+        "00E00400AD003BGC"
+        "0000900B0000A006"
+        "00C0000000000007"
+        "000D0700400C5000"
+        "B00E10G0F20500C0"
+        "02A0097E0000G000"
+        "10D300B567GE080A"
+        "G000000F10000E02"
+        "D07BGA0400F60023"
+        "000G3068C050F7A0"
+        "A10CD09000730060"
+        "60F80000GEA2009D"
+    ),
+    (
+        "000BG06200900D70"
+        "0010070800C00B04"
+        "G00050A00B0FE020"
+        "42080CF0E0701300"
+        "00B4005020G03000"
+        "0100C04EA3000GD2"
+        "8G0020B0F0094500"
+        "20ED000010450000"
+        "B006D000001A074F"
+        "A3200G0064009000"
+        "0040067080002E0B"
+        "DC0000007030A10G"
+        "00D0002000A00C0E"
+        "00A0180400067009"
+        "0070FBC690030A00"
+        "068005D0C10EG000"
+    ),
+    (
+        "000C0100EF600000"
+        "0G60000F9A08E035"
+        "09530080000204G0"
+        "B10F4000305G0008"
+        "G0E20B01C0003000"
+        "F00D07000030G000"
+        "00C50A0020800000"
+        "30080E0607GA0DC0"
+        "1027B004050000DE"
+        "85G90C0000200BF6"
+        "4C3B080DF6005200"
+        "ADFE5609G0000070"
+        "0F00030000B9C801"
+        "02D000C008007000"
+        "7000A5F80200D900"
+        "0000900000F0B0A0"
+    ),
+    (
+        "08A03G00002C000B"
+        "009F000004B070G0"
+        "71B6000900G0CA00"
+        "00GC7000DA9041F0"
+        "0000GE00F10000B9"
+        "CEF000080079G0D0"
+        "00639C4D000B5F10"
+        "1GD0F5BA03040CE0"
+        "05000700C0DG9030"
+        "00C00000B007000D"
+        "0D000905020A0000"
+        "6B000DE49500AGC0"
+        "00000FGB70030000"
+        "09008A0000000D05"
+        "0000010380002E40"
+        "F000062C0940070G"
+    ),
+]
+
+# 25x25 puzzles with 330 clues and a unique solution, from generate-batch --box 5 --unique --seed 25
+CORPUS_25X25 = [
+    (
+        "0GD00000KBIPEA075800FN3M4"
+        "O0000ENG3P5K40H90I0M0001B"
+        "I000E010M030JN0HP2FK50G80"
+        "N000HIC00JG7F2O000306K900"
+        "003K5F0020M09100E00G7IPH0"
+        "08OBA700C00N00FJ0L1903K00"
+        "300EF00000CG200A0000LO000"
+        "0P0G000N0A0O007F308E90020"
+        "M0ID93K0000H0J052P4CNGF68"
+        "000000010240080MO00D00J00"
+        "032J0OH0F0100540L90B060E0"
+        "600000050093P0D28000C0H00"
+        "C0050PG9D00A0E2600OFB400N"
+        "HFK01ML20N00000E040AD5790"
+        "090A00030ELF8C00005H2MOI0"
+        "00AL3N20P00I000G009J400B0"
+        "0CB0N0401M70L300000000600"
+        "90000G0BE30000A800H50L07I"
+        "5O006K800H00C0040A001E000"
+        "01000500900000007BN2K0A3C"
+        "PI08J17K0000049000003FBO0"
+        "E000M03F0O8CHLJ0B064I01NA"
+        "02C0L000J00B00M19E00G0500"
+        "F060O20L00P0GI300JA7M00CD"
+        "10N4DCPM090200000FI080ELJ"
+    ),
+    (
+        "0OLHD00000F0K0106PB0J00A0"
+        "AG00F010000000H0C7I00025P"
+        "BC00I20FG95J00A00K0E6H0N0"
+        "2E1KN000800006049O0J0G00I"
+        "93700P6CDJ0IBLE000800F040"
+        "00000IG06DHAJ0B0P00804N9K"
+        "OLP0C009A000D2K0G3E0I0080"
+        "000000N800E0700JI0H00M0P0"
+        "000JG0E0020P0M000007OL630"
+        "0I0A70C00PL6N000KF9M0000E"
+        "000EMH009714GCF0800005JD2"
+        "50A0JM0000090D0F01GOC0E00"
+        "09O00A315470000000C00B000"
+        "00200BK00G803IN00A091PM0H"
+        "0NFI00D000OH0K5PB4M270009"
+        "706093P00100E0LBAD0CH0IM0"
+        "G0E00N050L306000M900B802A"
+        "C0H840J0OKANM00E0I0091070"
+        "0M0OPD0H0000I0400GN106CK5"
+        "010BAC00E8P00G0O062000D0J"
+        "1009O8230000F0M000D00JG07"
+        "0080000P160G0H300M0N20K0F"
+        "0000EK0000902NJ6503G0ABH8"
+        "06003G0LM0DBO0802J70P9410"
+        "M002H0B00F0750IA00PKL0003"
+    ),
+    (
+        "000L00000N0630000MH0F07K0"
+        "0NEC0K0I00O400ADLF20HM080"
+        "M0J2000A00E0FC00590740B6D"
+        "00F0K06000M00D5EI3PC0029A"
+        "0060O0F0M00P0L0KGA80CI300"
+        "000B82O90GJ360DL0H0ME00NC"
+        "4H3000MD6I0G0EBP0OAK2J1F0"
+        "600005B03K700IF02EGD04A00"
+        "9GDI01JHF00A2M0B005N008OL"
+        "OM000A0000L10H00307000500"
+        "000G0PH000C00012JIM03000O"
+        "0OH049DGIJ00000800F0M001K"
+        "2005000B0M0000010600LH070"
+        "P0MADN1F000070000L0008J4I"
+        "0670N00LKAD000M0HGC0900E2"
+        "FL00A0KMJ09D8P0000EG00030"
+        "D00E6F05L0KCM00J40N08092B"
+        "G000J0038D00004000000KEI0"
+        "C40N0G0E0HILJ37000980O0DP"
+        "30800004C0G5EB2A00I0J00LF"
+        "00O6GH0K102I0J800N0000400"
+        "I7LDMJ0P000F41C008O009K03"
+        "8000P3004000HG00F00000O00"
+        "E00F000600000NOG0B0H02DJ0"
+        "02BK0M0ODE070900040I1FLA8"
+    ),
+]
+
+CORPORA = {
+    "default": DEFAULT_CORPUS,
+    "easy": EASY_CORPUS,
+    "hard": HARD_CORPUS,
+    "minimal": MINIMAL_CORPUS,
+    "adversarial": ADVERSARIAL_CORPUS,
+    "16x16": CORPUS_16X16,
+    "25x25": CORPUS_25X25,
+}
+
+
+class SolveTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise SolveTimeout
+
+
+def _timed_solve(solver_class, boards, timeout):
+    """Solve one board (or a batch for batched solvers); return (seconds, solver, solved), seconds None on timeout."""
+    solver = solver_class(boards)
+    # Timeouts rely on SIGALRM, so they only apply on platforms that have it
+    alarm = timeout and hasattr(signal, "setitimer")
+    if alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        solved = solver.solve()
+    except SolveTimeout:
+        return None, solver, False
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return time.perf_counter() - start, solver, solved
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def benchmark_corpus(solver_class, corpus, repeat=5, warmup=1, timeout=10.0, nodes=False, copies=1):
+    """
+    Time a solver on a corpus and return a dict of statistics.
+
+    Each puzzle is solved `warmup` untimed times and then `repeat` timed times; a puzzle that
+    exceeds `timeout` seconds is counted once as a timeout and not retried. Batched solvers get
+    the whole corpus, repeated `copies` times, per pass and every puzzle is charged an equal share
+    of the pass: a large batch spreads the solver's fixed setup cost as a real batch run does.
+    With `nodes`, one more untimed pass counts the search nodes over the puzzles that finished.
+    """
+    samples = []
+    finished = []  # Puzzles that did not time out, traced for peak memory afterwards
+    unsolved = 0
+
+    if getattr(solver_class, "batched", False):
+        batch = corpus * copies
+        for run in range(warmup + repeat):
+            elapsed, solver, _ = _timed_solve(solver_class, [parse_puzzle(line) for line in batch], None)
+            if run >= warmup:
+                samples.extend([elapsed / len(batch)] * len(batch))
+        finished = corpus
+        unsolved = sum(not solved for solved in solver.solved[:len(corpus)])
+    else:
+        for line in corpus:
+            for run in range(warmup + repeat):
+                elapsed, _, solved = _timed_solve(solver_class, parse_puzzle(line), timeout)
+                if elapsed is None:
+                    break
+                if run >= warmup:
+                    samples.append(elapsed)
+            else:
+                finished.append(line)
+                unsolved += not solved
+
+    stats = {
+        "puzzles": len(corpus),
+        "timeouts": len(corpus) - len(finished),
+        "unsolved": unsolved,
+        "peak_kib": trace_corpus(solver_class, finished),
+    }
+    if nodes:
+        stats["nodes"] = count_nodes(solver_class, finished)
+    if samples:
+        stats.update(
+            median_ms=statistics.median(samples) * 1000,
+            p95_ms=_percentile(samples, 0.95) * 1000,
+            max_ms=max(samples) * 1000,
+            puzzles_per_second=len(samples) / sum(samples),
+        )
+    return stats
+
+
+def trace_corpus(solver_class, corpus):
+    """Solve the corpus once under tracemalloc and return the largest per-puzzle peak in KiB."""
+    tracemalloc.start()
+    peak = 0
+    for line in corpus:
+        board = parse_puzzle(line)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        solver_class(board).solve()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def count_nodes(solver_class, corpus):
+    """Solve the corpus once with SearchStats attached and return the total number of search nodes."""
+    stats = SearchStats()
+    for line in corpus:
+        solver_class(parse_puzzle(line), stats=stats).solve()
+    return stats.nodes
+
+
+def benchmark_generation(solver_class, band, count=10, clues=None, targeted=True, seed=0, box=3, timeout=60.0):
+    """
+    Time generating `count` unique puzzles in a difficulty band of (low, high) level names and
+    return a dict of statistics. `targeted` hands the band to the generator, which digs for it and
+    gives up on a candidate as soon as it misses; otherwise puzzles are generated at a clue count
+    and each is graded in full afterwards, keeping those in the band. Without a clue count the
+    targeted generator digs as far as the band allows and the other keeps the default count.
+    Generation stops after `timeout` seconds with whatever puzzles it has.
+    """
+    generator = SudokuGenerator(solver_class, seed=seed, box=box)
+    low, high = LEVELS.index(band[0]), LEVELS.index(band[1])
+    accepted = 0
+    start = time.perf_counter()
+    while accepted < count and time.perf_counter() - start < timeout:
+        if targeted:
+            generator.generate_and_test(clues, difficulty=band)
+            accepted += 1
+        else:
+            puzzle = generator.generate_and_test(clues, unique=True)
+            grader = DifficultyGrader(Board(puzzle))
+            grader.grade()
+            accepted += low <= grader.level <= high
+    elapsed = time.perf_counter() - start
+    return {
+        "puzzles": accepted,
+        "candidates": generator.candidates,
+        "seconds": elapsed,
+        "puzzles_per_second": accepted / elapsed,
+    }
+
+
+def format_generation(name, band, stats):
+    return (
+        f"{name:30} {'-'.join(dict.fromkeys(band)):12} {stats['puzzles']:4} puzzles in {stats['seconds']:8.3f} s"
+        f"  {stats['puzzles_per_second']:9.2f} puzzles/s  {stats['candidates']:6} candidates"
+    )
+
+
+def run_benchmark(solver_classes, corpora, repeat=5, warmup=1, timeout=10.0, report=print, nodes=False, copies=1):
+    """
+    Benchmark every solver on every corpus and return the machine-readable results. `corpora`
+    names built-in corpora, or maps names to lists of puzzle lines. Batched solvers get each
+    corpus repeated `copies` times as one batch (see benchmark_corpus).
+    """
+    if not isinstance(corpora, dict):
+        corpora = {corpus_name: CORPORA[corpus_name] for corpus_name in corpora}
+    results = {}
+    for name, solver_class in solver_classes.items():
+        for corpus_name, corpus in corpora.items():
+            stats = benchmark_corpus(solver_class, corpus, repeat, warmup, timeout, nodes, copies)
+            results.setdefault(name, {})[corpus_name] = stats
+            report(format_stats(name, corpus_name, stats))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "warmup": warmup,
+        "timeout": timeout,
+        "copies": copies,
+        "results": results,
+    }
+
+
+def format_stats(name, corpus_name, stats):
+    if "median_ms" not in stats:
+        return f"{name:30} {corpus_name:12} all {stats['timeouts']} puzzles timed out"
+    return (
+        f"{name:30} {corpus_name:12} median {stats['median_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms"
+        f"  max {stats['max_ms']:9.3f} ms  {stats['puzzles_per_second']:9.1f} puzzles/s"
+        f"  peak {stats['peak_kib']:8.1f} KiB  timeouts {stats['timeouts']}  unsolved {stats['unsolved']}"
+        + (f"  nodes {stats['nodes']}" if "nodes" in stats else "")
+    )
+
+
+def compare(results, baseline, threshold=0.2, metric="median_ms"):
+    """
+    Compare results against a saved baseline and return a list of regression messages.
+
+    A solver/corpus pair regresses when `metric` grew by more than `threshold` (a fraction), or
+    when it has more timeouts than the baseline. Pairs missing from either side are ignored.
+    """
+    regressions = []
+    for name, corpora in results["results"].items():
+        for corpus_name, stats in corpora.items():
+            before = baseline.get("results", {}).get(name, {}).get(corpus_name)
+            if before is None:
+                continue
+            if stats["timeouts"] > before["timeouts"]:
+                regressions.append(f"{name}/{corpus_name}: timeouts {before['timeouts']} -> {stats['timeouts']}")
+            if metric in stats and metric in before and stats[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{name}/{corpus_name}: {metric} {before[metric]:.3f} -> {stats[metric]:.3f}")
+    return regressions
+
+
+def save_results(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
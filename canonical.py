@@ -0,0 +1,204 @@
+"""
+Canonical forms of Sudoku puzzles under the validity-preserving symmetries of the board.
+
+Two puzzles that differ only by relabelling digits, permuting rows within a band or columns within
+a stack, permuting bands or stacks, or transposing have the same canonical form. canonical_form()
+returns that form together with the Transform that produced it, so a solution found for the
+canonical puzzle can be mapped back onto the original one with Transform.restore().
+"""
+from itertools import permutations, product
+from math import factorial
+
+from Board import SYMBOLS
+from SudokuIndex import board_index
+
+# Largest box size searched over the full group: (box!)^(box + 1) line orders per axis is 1296
+# for 9x9 but about 8 million for 16x16, so larger boards are canonicalised by relabelling only
+MAX_SYMMETRY_BOX = 3
+
+# Most transforms that may tie on the clue pattern. Real puzzles tie on one or two, rarely more than
+# a few dozen, but a near-empty or completely filled 9x9 grid ties on up to 2 * 1296 * 1296 of
+# them, each compared digit by digit in Python: tens of seconds for a board any solver finishes in
+# milliseconds. canonical_form gives up on such boards rather than compare them all.
+MAX_TIES = 1024
+
+
+class Transform:
+    """
+    A symmetry taking an original board to its canonical form: transpose first if `transpose`,
+    then take rows in the order `rows` and columns in the order `cols`, then relabel each
+    digit d as labels[d] (labels[0] == 0 keeps blanks blank).
+    """
+
+    def __init__(self, transpose, rows, cols, labels):
+        self.transpose = transpose
+        self.rows = rows
+        self.cols = cols
+        self.labels = labels
+
+    def apply(self, board):
+        """The board as the transform maps it, as a new list of lists."""
+        board = _transposed(board) if self.transpose else board
+        labels = self.labels
+        return [[labels[board[row][col]] for col in self.cols] for row in self.rows]
+
+    def restore(self, board):
+        """Map a board in canonical coordinates (such as a cached solution) back onto the original."""
+        size = len(board)
+        digits = [0] * (size + 1)
+        for digit, label in enumerate(self.labels):
+            digits[label] = digit
+        original = [[0] * size for _ in range(size)]
+        for i, row in enumerate(self.rows):
+            for j, col in enumerate(self.cols):
+                original[row][col] = digits[board[i][j]]
+        return _transposed(original) if self.transpose else original
+
+
+def canonical_form(board, max_ties=MAX_TIES):
+    """
+    Return (key, transform): key is the canonical puzzle as a line string, the same for every
+    puzzle in the symmetry class, and transform maps this board onto it. Return None when more
+    than `max_ties` transforms tie on the clue pattern (None for no limit): such boards, nearly
+    empty or nearly full, are cheaper to solve than to canonicalise.
+
+    The canonical form is the smallest image of the board, comparing first the pattern of blanks
+    and clues (blanks first) and then the digits, relabelled in order of first appearance. Clue
+    patterns rarely have more than a handful of symmetries, so the digit comparison only has to
+    look at the few transforms that tie on the pattern, and drops each as soon as it reads a
+    digit above the best image so far.
+    """
+    size = len(board)
+    index = board_index(size)
+    if index.box > MAX_SYMMETRY_BOX:
+        transforms = [(False, tuple(range(size)), tuple(range(size)))]
+    else:
+        transforms = _pattern_minimal(board, index.box, max_ties)
+        if transforms is None:
+            return None
+
+    best_key, best_transform = None, None
+    for transpose, rows, cols in transforms:
+        source = _transposed(board) if transpose else board
+        labels = [0] * (size + 1)
+        next_label = 1
+        values = []
+        # The image is compared with best_key as it is read: smaller once a digit falls below, dropped once one is above
+        smaller, larger = best_key is None, False
+        for row in rows:
+            line = source[row]
+            for col in cols:
+                digit = line[col]
+                if digit and not labels[digit]:
+                    labels[digit] = next_label
+                    next_label += 1
+                value = labels[digit]
+                if not smaller and value != best_key[len(values)]:
+                    larger = value > best_key[len(values)]
+                    if larger:
+                        break
+                    smaller = True
+                values.append(value)
+            if larger:
+                break
+        if smaller:
+            # Digits the puzzle never uses take the remaining labels in ascending order
+            for digit in range(1, size + 1):
+                if not labels[digit]:
+                    labels[digit] = next_label
+                    next_label += 1
+            best_key, best_transform = tuple(values), Transform(transpose, rows, cols, labels)
+    return "".join(SYMBOLS[value] for value in best_key), best_transform
+
+
+def _pattern_minimal(board, box, limit=None):
+    """
+    Every (transpose, rows, cols) whose image has the smallest clue pattern, read row by row;
+    None when there are more than `limit` of them.
+    """
+    size = box * box
+    within = list(permutations(range(box)))
+    best, found, tied = None, [], 0
+
+    # Columns are ordered a stack at a time, each row's pattern growing by box bits per stack.
+    # With columns fixed, sorting rows within bands and then bands gives the smallest rows, so
+    # the first row of the image is the smallest pattern: a branch whose smallest partial
+    # pattern is already above the best first row cannot catch up.
+    def search(transpose, chunks, cols, patterns, stacks):
+        nonlocal best, found, tied
+        if not stacks:
+            key = sorted(sorted(patterns[band:band + box]) for band in range(0, size, box))
+            if best is None or key < best:
+                best, found, tied = key, [], 0
+            if key == best:
+                # Past the limit ties are only counted, in case a smaller pattern turns up and resets them
+                tied += _count_row_orders(patterns, box)
+                if limit is None or tied <= limit:
+                    found.append((transpose, cols, patterns))
+            return
+        shift = box * (len(stacks) - 1)
+        for stack in stacks:
+            rest = [other for other in stacks if other != stack]
+            for order, chunk in zip(within, chunks[stack]):
+                grown = [pattern << box | bits for pattern, bits in zip(patterns, chunk)]
+                if best is not None and min(grown) > best[0][0] >> shift:
+                    continue
+                search(transpose, chunks, cols + tuple(stack * box + i for i in order), grown, rest)
+
+    for transpose in (False, True):
+        source = _transposed(board) if transpose else board
+        # chunks[stack][k] holds each row's clue bits in that stack, columns in the k-th order of within
+        chunks = [
+            [
+                [sum(1 << (box - 1 - k) for k, i in enumerate(order) if row[stack * box + i]) for row in source]
+                for order in within
+            ]
+            for stack in range(box)
+        ]
+        search(transpose, chunks, (), [0] * size, list(range(box)))
+    if limit is not None and tied > limit:
+        return None
+    return [
+        (transpose, rows, cols) for transpose, cols, patterns in found for rows in _tied_row_orders(patterns, box)
+    ]
+
+
+def _tied_row_orders(patterns, box):
+    """
+    Every row order giving the smallest image of the rows' patterns: rows sorted within bands,
+    bands sorted, in any order among rows (and among bands) whose patterns are equal.
+    """
+    def band_orders(band):
+        groups = {}
+        for row in range(band, band + box):
+            groups.setdefault(patterns[row], []).append(row)
+        options = [permutations(groups[pattern]) for pattern in sorted(groups)]
+        return [tuple(row for group in choice for row in group) for choice in product(*options)]
+
+    bands = {}
+    for band in range(0, box * box, box):
+        bands.setdefault(tuple(sorted(patterns[band:band + box])), []).append(band_orders(band))
+    orders = []
+    for choice in product(*(permutations(bands[key]) for key in sorted(bands))):
+        for rows in product(*(band for arrangement in choice for band in arrangement)):
+            orders.append(tuple(row for band in rows for row in band))
+    return orders
+
+
+def _count_row_orders(patterns, box):
+    """The number of row orders _tied_row_orders lists for these patterns, without listing them."""
+    count = 1
+    bands = {}
+    for band in range(0, box * box, box):
+        rows = patterns[band:band + box]
+        for pattern in set(rows):
+            count *= factorial(rows.count(pattern))
+        key = tuple(sorted(rows))
+        bands[key] = bands.get(key, 0) + 1
+    for repeats in bands.values():
+        count *= factorial(repeats)
+    return count
+
+
+def _transposed(board):
+    return [list(column) for column in zip(*board)]
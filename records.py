@@ -0,0 +1,158 @@
+import mmap
+import os
+
+from batch import map_chunks, solve_lines
+
+# Records written for a puzzle with no solution and for a malformed puzzle, padded to the record's width
+UNSOLVABLE = b"unsolvable"
+INVALID = b"invalid"
+
+
+class RecordFile:
+    """
+    A puzzle corpus of fixed-width records, one puzzle line and its newline each, memory-mapped.
+
+    The record width comes from the first line, so the file holds one board size: 82 bytes for
+    9x9, 257 for 16x16. Record i starts at byte i * width, so reading any record or any range of
+    them costs the same however large the file is, and only the pages touched are read from disk.
+    The last record may lack its newline.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            # mmap cannot map an empty file
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        newline = self._map.find(b"\n")
+        self.width = (newline if newline >= 0 else len(self._map)) + 1
+        self.count = -(-len(self._map) // self.width)
+        if len(self._map) not in (self.count * self.width, self.count * self.width - 1):
+            raise ValueError(f"{path}: {len(self._map)} bytes is not a whole number of {self.width}-byte records")
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        """The raw bytes of record `index`, without its newline."""
+        if not 0 <= index < self.count:
+            raise IndexError("record index out of range")
+        start = index * self.width
+        return self._map[start:start + self.width - 1]
+
+    def lines(self, start=0, stop=None):
+        """
+        The puzzle lines of records start to stop (default: the end), as str. Bytes that are not
+        ASCII become U+FFFD, so Board.from_line rejects their record alone.
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        return [self.record(index).decode("ascii", errors="replace") for index in range(start, stop)]
+
+    def sample(self, count):
+        """The puzzle lines of `count` records spread evenly through the file, read without scanning it."""
+        count = min(count, self.count)
+        return [self.record(self.count * step // count).decode("ascii", errors="replace") for step in range(count)]
+
+    def shards(self, count):
+        """Split the file into at most `count` contiguous (start, stop) record ranges of near-equal size."""
+        count = max(1, min(count, self.count))
+        return [(self.count * shard // count, self.count * (shard + 1) // count) for shard in range(count)]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordWriter:
+    """
+    The output side of a RecordFile: a file preallocated to `count` records of `width` bytes,
+    where each process writes the records of its own shard in place through a memory map.
+
+    create() sizes the file once, before the shards are handed out; every worker then opens it
+    with RecordWriter(path, width) and writes at the offsets of its input records, so outputs
+    line up with inputs without collecting results in one process.
+    """
+
+    def __init__(self, path, width):
+        self.path = path
+        self.width = width
+        with open(path, "r+b") as file:
+            size = os.fstat(file.fileno()).st_size
+            self._map = mmap.mmap(file.fileno(), 0) if size else None
+        self.count = size // width
+
+    @classmethod
+    def create(cls, path, count, width):
+        """Preallocate (sparsely, where the file system allows) an output file of `count` records."""
+        with open(path, "wb") as file:
+            file.truncate(count * width)
+        return cls(path, width)
+
+    def write(self, index, line):
+        """Write one line, padded with spaces to the record width, as record `index`."""
+        if not 0 <= index < self.count:
+            raise IndexError("record index out of range")
+        if len(line) >= self.width:
+            raise ValueError(f"{len(line)} bytes do not fit a {self.width}-byte record")
+        start = index * self.width
+        self._map[start:start + self.width] = line.ljust(self.width - 1) + b"\n"
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def solve_shard(solver_class, input_path, output_path, shard):
+    """
+    Solve the records of one (start, stop) shard of input_path into the same records of output_path.
+    Only the paths and the range cross the process boundary. Returns the number of puzzles solved
+    and the indices of the malformed records, with the reason for each.
+    """
+    start, stop = shard
+    invalid = []
+    with RecordFile(input_path) as records, RecordWriter(output_path, records.width) as writer:
+        solutions = solve_lines(solver_class, records.lines(start, stop))
+        for index, solution in enumerate(solutions, start):
+            if isinstance(solution, ValueError):
+                invalid.append((index, str(solution)))
+                writer.write(index, INVALID)
+            else:
+                writer.write(index, UNSOLVABLE if solution is None else solution.encode("ascii"))
+    return sum(isinstance(solution, str) for solution in solutions), invalid
+
+
+def solve_file(solver_class, input_path, output_path, workers=None, shard_size=4096):
+    """
+    Solve every record of a fixed-width corpus file into a preallocated output file of the same
+    layout, record i of the output holding the solution of record i of the input (or "unsolvable").
+
+    The file is cut into shards of about `shard_size` records; each worker maps both files itself,
+    so no puzzle or solution goes through a pipe. Malformed records get "invalid". Returns
+    (puzzles, solved, invalid), the last a list of (index, reason) pairs in index order.
+    """
+    with RecordFile(input_path) as records:
+        count, width = len(records), records.width
+        shards = records.shards(max(1, -(-count // shard_size)))
+    RecordWriter.create(output_path, count, width).close()
+    if not count:
+        return 0, 0, []
+    results = map_chunks(solve_shard, (solver_class, input_path, output_path), shards, workers, ordered=False)
+    solved, invalid = 0, []
+    for _, (shard_solved, shard_invalid) in results:
+        solved += shard_solved
+        invalid += shard_invalid
+    return count, solved, sorted(invalid)
@@ -1,47 +1,533 @@
 import argparse
+import asyncio
+import json
+import random
+import sys
+from functools import partial
+from itertools import islice, zip_longest
+from Board import LINE_LENGTHS, Board
 from BacktrackingSolver import BacktrackingSolver
 from ConstraintPropagationSolver import ConstraintPropagationSolver
 from ConstraintPropagationWithMRVSolver import ConstraintPropagationWithMRVSolver
-from SudokuGenerator import SudokuGenerator
+from SudokuGenerator import SYMMETRIES, SudokuGenerator
+from DifficultyGrader import LEVELS, DifficultyGrader, parse_band
+from SearchStats import SearchStats
+from PropagationEngine import RULES
+from SolutionCache import SolutionCache, cached
+from SolveServer import SolveServer
 from AC3Solver import AC3Solver
+from DLXSolver import DLXSolver
+from PortfolioSolver import PortfolioSolver
+import benchmark
+from batch import generate_batch, puzzle_seed, read_puzzles, solve_batch
+from records import RecordFile, solve_file
+from validate import BLOCK, parse_lines, validate_grids
+
+try:
+    from NumpyBatchSolver import NumpyBatchSolver
+except ImportError:  # NumPy is optional; the vectorised solver is only offered when it is installed
+    NumpyBatchSolver = None
+
+# Map the solver name accepted on the command line to the corresponding solver class
+solver_classes = {
+    "Backtracking": BacktrackingSolver,
+    "ConstraintPropagation": ConstraintPropagationSolver,
+    "ConstraintPropagationWithMRV": ConstraintPropagationWithMRVSolver,
+    "AC3": AC3Solver,
+    "DLX": DLXSolver,
+}
+if NumpyBatchSolver is not None:
+    solver_classes["NumpyBatch"] = NumpyBatchSolver
+# Races DLX, ConstraintPropagationWithMRV and Backtracking in separate processes (see --race)
+solver_classes["Portfolio"] = PortfolioSolver
+
+# Search settings of ConstraintPropagation and AC3 that benchmark --search compares with their default backjumping
+SEARCH_VARIANTS = {
+    "chronological": {"backjump": False},
+    "nogoods": {"nogoods": 1024},
+}
+
+# Help for the --difficulty options
+DIFFICULTY_HELP = (
+    f"Only keep puzzles graded within BAND, one level or LOW-HIGH of {', '.join(LEVELS)} "
+    "(implies --unique; without --clues, clues are dug out as far as the band allows)."
+)
 
 def is_valid_sudoku(grid):
     """
     Validates whether the given Sudoku grid satisfies all Sudoku rules.
+    The grid may be 9x9, 16x16 or 25x25; any side length that is a perfect square works.
+    Blanks are allowed. Many grids are checked at once with validate_grids, which this wraps.
     """
-    def is_unique(block):
-        """Helper function to check if all non-zero numbers in a block are unique."""
-        nums = [num for num in block if num != 0]
-        return len(nums) == len(set(nums))
-
-    # Check all rows
-    for row in grid:
-        if not is_unique(row):
-            return False
-
-    # Check all columns
-    for col in range(9):
-        if not is_unique([grid[row][col] for row in range(9)]):
-            return False
-
-    # Check all 3x3 sub-grids
-    for box_row in range(0, 9, 3):
-        for box_col in range(0, 9, 3):
-            box = [
-                grid[row][col]
-                for row in range(box_row, box_row + 3)
-                for col in range(box_col, box_col + 3)
-            ]
-            if not is_unique(box):
-                return False
-
-    return True
-
-def main():
+    valid, _ = validate_grids([grid], complete=False)
+    return bool(valid[0])
+
+def solve_batch_command(argv):
+    """Solve puzzles read from a file or stdin, one line each, across a process pool."""
+    parser = argparse.ArgumentParser(
+        prog="sudoku.py solve-batch",
+        description=(
+            "Solve puzzles in the line format: 81 characters for 9x9, 256 for 16x16 or 625 for 25x25, "
+            "'0' or '.' for blanks and letters for values above 9."
+        ),
+    )
+    parser.add_argument("solver", choices=list(solver_classes), help="The Sudoku solver to use.")
+    parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="File with one puzzle per line (default: stdin).",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunksize", type=int, default=64, help="Puzzles sent to a worker per task.")
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Print results as they complete, prefixed with the puzzle's 0-based input index.",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Answer puzzles seen before, up to relabelling and symmetry, from an in-memory cache.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        metavar="PATH",
+        help="Also keep cached solutions in a SQLite file at PATH, shared by workers and later runs (implies --cache).",
+    )
+    parser.add_argument("--cache-size", type=int, default=4096, help="Solutions each process keeps in memory.")
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        help=(
+            "Treat the input file as fixed-width records (one board size, one puzzle per line), memory-map it "
+            "in shards across the workers and write each solution to PATH at its puzzle's offset."
+        ),
+    )
+    parser.add_argument("--shard-size", type=int, default=4096, help="Records per shard with --output.")
+    args = parser.parse_args(argv)
+
+    solver_class = solver_classes[args.solver]
+    cache = None
+    if args.cache or args.cache_file:
+        cache = SolutionCache(args.cache_size, args.cache_file)
+        solver_class = cached(solver_class, cache)
+
+    if args.output:
+        if args.input is sys.stdin:
+            parser.error("--output needs an input file")
+        args.input.close()
+        try:
+            count, solved, invalid = solve_file(
+                solver_class, args.input.name, args.output, args.workers, args.shard_size
+            )
+        except ValueError as error:
+            parser.error(str(error))
+        for index, reason in invalid:
+            print(f"line {index + 1}: {reason}", file=sys.stderr)  # Record i is line i + 1
+        unsolvable = count - solved - len(invalid)
+        print(f"{count} puzzles, {solved} solved, {unsolvable} unsolvable, {len(invalid)} invalid", file=sys.stderr)
+        return 1 if invalid else None
+
+    line_numbers = {}
+    results = solve_batch(
+        solver_class,
+        read_puzzles(args.input, line_numbers),
+        workers=args.workers,
+        chunksize=args.chunksize,
+        ordered=not args.unordered,
+    )
+    invalid = 0
+    for index, solution in results:
+        number = line_numbers.pop(index)
+        if isinstance(solution, ValueError):
+            # A malformed line only loses its own result; the run goes on and fails at the end
+            print(f"line {number}: {solution}", file=sys.stderr)
+            invalid += 1
+            line = "invalid"
+        else:
+            line = solution or "unsolvable"
+        print(f"{index}\t{line}" if args.unordered else line)
+    if cache is not None and args.workers == 1:
+        # Worker processes keep their own counters, so only an in-process run can report them
+        print("Cache statistics:", file=sys.stderr)
+        print(cache, file=sys.stderr)
+    if invalid:
+        print(f"{invalid} invalid puzzle lines", file=sys.stderr)
+        return 1
+
+def generate_batch_command(argv):
+    """Generate a catalogue of puzzles across a process pool, streaming them to a file or stdout."""
+    parser = argparse.ArgumentParser(
+        prog="sudoku.py generate-batch",
+        description="Generate puzzles reproducibly from a master seed.",
+    )
+    parser.add_argument("solver", choices=list(solver_classes), help="The solver that must accept each puzzle.")
+    parser.add_argument("--count", type=int, required=True, help="Number of puzzles to generate.")
+    parser.add_argument(
+        "--box",
+        type=int,
+        choices=[2, 3, 4, 5],
+        default=3,
+        help="Box size: 3 for 9x9 puzzles (default), 4 for 16x16, 5 for 25x25.",
+    )
+    parser.add_argument(
+        "--clues",
+        type=int,
+        default=None,
+        help="Clues left in each puzzle (default: 30 on 9x9, 115 on 16x16, 330 on 25x25).",
+    )
+    parser.add_argument("--unique", action="store_true", help="Only accept puzzles with exactly one solution.")
+    parser.add_argument(
+        "--symmetry",
+        choices=list(SYMMETRIES),
+        default="none",
+        help="With --unique, blank cells in symmetric groups.",
+    )
+    parser.add_argument("--difficulty", metavar="BAND", help=DIFFICULTY_HELP)
+    parser.add_argument("--seed", type=int, default=None, help="Master seed (default: random, printed to stderr).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunksize", type=int, default=16, help="Puzzles generated per task.")
+    parser.add_argument("--format", choices=["line", "jsonl"], default="line", help="Output format.")
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="File to write the puzzles to (default: stdout).",
+    )
+    args = parser.parse_args(argv)
+
+    solver_class = solver_classes[args.solver]
+    try:
+        difficulty = parse_band(args.difficulty) if args.difficulty else None
+    except ValueError as error:
+        parser.error(str(error))
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
+        print(f"seed: {args.seed}", file=sys.stderr)
+
+    puzzles = generate_batch(
+        solver_class,
+        args.count,
+        clues=args.clues,
+        unique=args.unique,
+        symmetry=args.symmetry,
+        seed=args.seed,
+        workers=args.workers,
+        chunksize=args.chunksize,
+        box=args.box,
+        difficulty=difficulty,
+    )
+    try:
+        for index, puzzle in puzzles:
+            if args.format == "jsonl":
+                record = {
+                    "index": index,
+                    "seed": puzzle_seed(args.seed, index),
+                    "clues": len(puzzle) - puzzle.count("0"),
+                    "puzzle": puzzle,
+                }
+                args.output.write(json.dumps(record) + "\n")
+            else:
+                args.output.write(puzzle + "\n")
+    except ValueError as error:
+        parser.error(str(error))
+
+def verify_command(argv):
+    """Check solver output against its puzzles in bulk, listing the solutions that are wrong."""
+    parser = argparse.ArgumentParser(
+        prog="sudoku.py verify",
+        description=(
+            "Check that each solution line is a complete, valid grid that keeps every clue of the "
+            "puzzle on the same line of the puzzle file. 'unsolvable' lines, and the 'invalid' lines "
+            "solve-batch writes for malformed puzzles, are counted, not checked."
+        ),
+    )
+    parser.add_argument("puzzles", type=argparse.FileType("r"), help="File with one puzzle per line.")
+    parser.add_argument("solutions", type=argparse.FileType("r"), help="Solver output, one line per puzzle.")
+    parser.add_argument("--block", type=int, default=BLOCK, help="Lines checked per batch.")
+    args = parser.parse_args(argv)
+
+    puzzles, solutions = read_puzzles(args.puzzles), read_puzzles(args.solutions)
+    checked = unsolvable = malformed = failed = 0
+    while True:
+        pairs = list(islice(zip_longest(puzzles, solutions), args.block))
+        if not pairs:
+            break
+        if any(puzzle is None or solution is None for puzzle, solution in pairs):
+            parser.error("the puzzle and solution files have different numbers of lines")
+        # Solutions grouped by line length, one board size each; a line of the wrong length is invalid on its own
+        sizes = {}
+        wrong = []
+        for index, (puzzle, solution) in enumerate(pairs, checked):
+            if solution == "invalid":
+                malformed += 1
+            elif solution == "unsolvable":
+                unsolvable += 1
+            elif len(solution) in LINE_LENGTHS and len(puzzle) == len(solution):
+                sizes.setdefault(len(solution), []).append(index)
+            else:
+                wrong.append(index)
+        for indices in sizes.values():
+            valid, failures = validate_grids(
+                parse_lines(pairs[index - checked][1] for index in indices),
+                parse_lines(pairs[index - checked][0] for index in indices),
+            )
+            wrong += [indices[failure] for failure in failures]
+        for index in sorted(wrong):
+            print(f"{index}\tinvalid")
+        failed += len(wrong)
+        checked += len(pairs)
+    valid = checked - unsolvable - malformed - failed
+    print(
+        f"{checked} puzzles, {valid} valid, {failed} invalid, {unsolvable} unsolvable, {malformed} malformed",
+        file=sys.stderr,
+    )
+    return 1 if failed else None
+
+def grade_command(argv):
+    """Grade puzzles by the techniques they need and count their solutions, one JSON line each."""
+    parser = argparse.ArgumentParser(
+        prog="sudoku.py grade",
+        description=(
+            "Grade each puzzle by the hardest techniques it needs: "
+            f"{', '.join(LEVELS)}, the last meaning search. Solutions are counted up to 2."
+        ),
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="File with one puzzle per line (default: stdin).",
+    )
+    args = parser.parse_args(argv)
+
+    levels = {}
+    for index, line in enumerate(read_puzzles(args.input)):
+        try:
+            grader = DifficultyGrader(Board.from_line(line))
+        except ValueError as error:
+            parser.error(f"line {index}: {error}")
+        level = grader.grade() or "unsolvable"
+        levels[level] = levels.get(level, 0) + 1
+        print(json.dumps({"index": index, **grader.as_dict()}))
+    print(", ".join(f"{count} {level}" for level, count in levels.items()) or "no puzzles", file=sys.stderr)
+
+def benchmark_command(argv):
+    """Time the solvers on the built-in corpora, optionally failing on a regression against a baseline."""
+    parser = argparse.ArgumentParser(
+        prog="sudoku.py benchmark",
+        description="Benchmark the solvers on built-in puzzle corpora.",
+    )
+    parser.add_argument(
+        "--solver",
+        action="append",
+        choices=list(solver_classes),
+        help="Solver to run; may be repeated (default: all).",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=list(benchmark.CORPORA),
+        help="Corpus to solve; may be repeated (default: all).",
+    )
+    parser.add_argument(
+        "--corpus-file",
+        action="append",
+        metavar="PATH",
+        help="Also solve puzzles sampled from a fixed-width record file (see solve-batch --output); may be repeated.",
+    )
+    parser.add_argument("--sample", type=int, default=100, help="Puzzles taken evenly across each --corpus-file.")
+    parser.add_argument(
+        "--copies",
+        type=int,
+        default=1,
+        help=(
+            "Times each corpus is repeated to form one batch for batched solvers such as NumpyBatch; "
+            "results stay per puzzle. Other solvers take one puzzle at a time anyway."
+        ),
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed solves per puzzle.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed solves per puzzle before timing.")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a solve counts as a timeout.")
+    parser.add_argument(
+        "--rules",
+        action="append",
+        metavar="RULE[,RULE...]",
+        help=(
+            "Also benchmark ConstraintPropagationWithMRV with these inference rules; may be repeated "
+            f"to compare rule sets. Rules: {', '.join(RULES)}."
+        ),
+    )
+    parser.add_argument(
+        "--search",
+        action="append",
+        choices=list(SEARCH_VARIANTS),
+        help=(
+            "Also benchmark ConstraintPropagation and AC3 backtracking chronologically instead of backjumping, "
+            "or backjumping and learning nogoods; may be repeated. Compare node counts with --nodes."
+        ),
+    )
+    parser.add_argument(
+        "--generate",
+        action="append",
+        metavar="BAND",
+        help=(
+            "Also time generating unique puzzles in a difficulty band (one level or LOW-HIGH of "
+            f"{', '.join(LEVELS)}), both by grading puzzles of a clue count afterwards and by targeting the "
+            "band while generating; may be repeated."
+        ),
+    )
+    parser.add_argument("--generate-count", type=int, default=10, help="Puzzles to generate per band and method.")
+    parser.add_argument("--clues", type=int, default=None, help="Clues left in the puzzles --generate times.")
+    parser.add_argument("--nodes", action="store_true", help="Also count search nodes per corpus.")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON to PATH.")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON results to compare against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Fractional slowdown of the median over the baseline that counts as a regression.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.copies < 1:
+        parser.error("--copies must be at least 1")
+    variants = args.rules or args.search or args.generate
+    selected = {name: solver_classes[name] for name in args.solver or ([] if variants else solver_classes)}
+    for rule_set in args.rules or []:
+        rules = tuple(rule_set.split(","))
+        unknown = set(rules) - set(RULES)
+        if unknown:
+            parser.error(f"unknown inference rules: {', '.join(sorted(unknown))}")
+        selected[f"ConstraintPropagationWithMRV[{rule_set}]"] = partial(ConstraintPropagationWithMRVSolver, rules=rules)
+    for variant in args.search or []:
+        for name in ("ConstraintPropagation", "AC3"):
+            selected[f"{name}[{variant}]"] = partial(solver_classes[name], **SEARCH_VARIANTS[variant])
+    bands = {}
+    for spec in args.generate or []:
+        try:
+            bands[spec] = parse_band(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    corpora = {
+        name: benchmark.CORPORA[name]
+        for name in args.corpus or ([] if args.corpus_file or bands else benchmark.CORPORA)
+    }
+    for path in args.corpus_file or []:
+        try:
+            with RecordFile(path) as records:
+                corpora[path] = records.sample(args.sample)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    results = benchmark.run_benchmark(
+        selected,
+        corpora,
+        repeat=args.repeat,
+        warmup=args.warmup,
+        timeout=args.timeout,
+        nodes=args.nodes,
+        copies=args.copies,
+    )
+    for spec, band in bands.items():
+        for method, targeted in (("graded", False), ("targeted", True)):
+            stats = benchmark.benchmark_generation(DLXSolver, band, args.generate_count, args.clues, targeted)
+            results.setdefault("generation", {}).setdefault(spec, {})[method] = stats
+            print(benchmark.format_generation(f"generate[{method}]", band, stats))
+    if args.json:
+        benchmark.save_results(results, args.json)
+    if args.baseline:
+        regressions = benchmark.compare(results, benchmark.load_results(args.baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+def serve_command(argv):
+    """Run the solvers as a long-lived local service, so requests skip interpreter start-up and imports."""
+    parser = argparse.ArgumentParser(
+        prog="sudoku.py serve",
+        description=(
+            'Serve JSON-lines requests such as {"id": 1, "solver": "DLX", "puzzle": "...", "timeout": 1.0} '
+            'over TCP or a Unix socket; {"op": "metrics"} returns latency histograms and queue depth.'
+        ),
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8642, help="TCP port to listen on.")
+    parser.add_argument("--unix", metavar="PATH", help="Listen on a Unix socket at PATH instead of TCP.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--max-batch", type=int, default=32, help="Most requests sent to a worker at once.")
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=2.0,
+        help="Milliseconds to wait for more requests before sending a batch.",
+    )
+    parser.add_argument("--queue-size", type=int, default=1024, help="Requests that may wait; more are rejected.")
+    parser.add_argument("--solver", choices=list(solver_classes), default="DLX", help="Solver of requests naming none.")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds allowed to requests that give none.")
+    args = parser.parse_args(argv)
+
+    server = SolveServer(
+        solver_classes,
+        workers=args.workers,
+        max_batch=args.max_batch,
+        batch_window=args.batch_window / 1000,
+        queue_size=args.queue_size,
+        default_solver=args.solver,
+        default_timeout=args.timeout,
+    )
+
+    async def serve():
+        listener = await server.start(args.host, args.port, args.unix)
+        where = args.unix or ":".join(map(str, listener.sockets[0].getsockname()[:2]))
+        print(f"Serving on {where} with {server.workers} workers", file=sys.stderr)
+        try:
+            await listener.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        parser.error(str(error))
+
+def parse_budgets(parser, specs, convert):
+    """Turn repeated SOLVER=LIMIT options into a dict of limits by solver name."""
+    budgets = {}
+    for spec in specs or []:
+        name, _, limit = spec.partition("=")
+        if name not in solver_classes:
+            parser.error(f"unknown solver in budget {spec!r}")
+        try:
+            budgets[name] = convert(limit)
+        except ValueError:
+            parser.error(f"invalid budget {spec!r}")
+    return budgets
+
+# Subcommands dispatched on the first argument; anything else is the single-puzzle interface below
+commands = {
+    "solve-batch": solve_batch_command,
+    "generate-batch": generate_batch_command,
+    "verify": verify_command,
+    "grade": grade_command,
+    "benchmark": benchmark_command,
+    "serve": serve_command,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in commands:
+        return commands[argv[0]](argv[1:])
+
     parser = argparse.ArgumentParser(description="Solve Sudoku using a specified solver.")
     parser.add_argument(
         "solver",
-        choices=["Backtracking", "ConstraintPropagation", "ConstraintPropagationWithMRV", "AC3"],
+        choices=list(solver_classes),
         help="The Sudoku solver to use.",
     )
     parser.add_argument(
@@ -49,26 +535,101 @@ def main():
         action="store_true",
         help="Generate a new Sudoku grid instead of using a predefined puzzle.",
     )
-    args = parser.parse_args()
-
-    # Map the string argument to the corresponding solver class
-    solver_classes = {
-        "Backtracking": BacktrackingSolver,
-        "ConstraintPropagation": ConstraintPropagationSolver,
-        "ConstraintPropagationWithMRV": ConstraintPropagationWithMRVSolver,
-        "AC3": AC3Solver,
-    }
+    parser.add_argument(
+        "--unique",
+        action="store_true",
+        help="With --generate, only accept puzzles that have exactly one solution.",
+    )
+    parser.add_argument(
+        "--box",
+        type=int,
+        choices=[2, 3, 4, 5],
+        default=3,
+        help="With --generate, the box size: 3 for 9x9 (default), 4 for 16x16, 5 for 25x25.",
+    )
+    parser.add_argument(
+        "--clues",
+        type=int,
+        default=None,
+        help="With --generate, the number of clues to leave (default: 30 on 9x9).",
+    )
+    parser.add_argument(
+        "--symmetry",
+        choices=list(SYMMETRIES),
+        default="none",
+        help="With --generate --unique, blank cells in symmetric groups.",
+    )
+    parser.add_argument("--difficulty", metavar="BAND", help=f"With --generate: {DIFFICULTY_HELP}")
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print search statistics (nodes, backtracks, propagation) after solving.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        metavar="PATH",
+        help="Look the puzzle up, up to relabelling and symmetry, in a SQLite solution cache at PATH first.",
+    )
+    racers = [name for name in solver_classes if name not in ("Portfolio", "NumpyBatch")]
+    parser.add_argument(
+        "--race",
+        action="append",
+        choices=racers,
+        help=(
+            "With the Portfolio solver, a solver to race; may be repeated "
+            "(default: DLX, ConstraintPropagationWithMRV, Backtracking)."
+        ),
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="With the Portfolio solver, seconds to wait for any solver to finish.",
+    )
+    parser.add_argument(
+        "--time-budget",
+        action="append",
+        metavar="SOLVER=SECONDS",
+        help="With the Portfolio solver, drop SOLVER from the race after SECONDS; may be repeated.",
+    )
+    parser.add_argument(
+        "--node-budget",
+        action="append",
+        metavar="SOLVER=NODES",
+        help="With the Portfolio solver, drop SOLVER from the race after NODES search nodes; may be repeated.",
+    )
+    args = parser.parse_args(argv)
 
     # Get the solver class based on the first argument
     solver_class = solver_classes[args.solver]
+    if args.solver == "Portfolio":
+        solver_class = partial(
+            PortfolioSolver,
+            solvers={name: solver_classes[name] for name in args.race} if args.race else None,
+            time_budgets=parse_budgets(parser, args.time_budget, float),
+            node_budgets=parse_budgets(parser, args.node_budget, int),
+            timeout=args.timeout,
+        )
+    cache = SolutionCache(path=args.cache_file) if args.cache_file else None
 
     # Generate or use a predefined grid
     if args.generate:
         print(f"Generating a new Sudoku puzzle using {args.solver} solver...")
-        generator = SudokuGenerator(solver_class)
-        puzzle = generator.generate_and_test(clues=30)
+        generator = SudokuGenerator(solver_class, stats=SearchStats() if args.stats else None, box=args.box)
+        try:
+            difficulty = parse_band(args.difficulty) if args.difficulty else None
+            puzzle = generator.generate_and_test(
+                clues=args.clues, unique=args.unique, symmetry=args.symmetry, difficulty=difficulty
+            )
+        except ValueError as error:
+            parser.error(str(error))
         for row in puzzle:
             print(" ".join(map(str, row)))
+        if generator.grader is not None:
+            print(f"Difficulty: {LEVELS[generator.grader.level]} ({generator.candidates} grids drawn)")
+        if args.stats:
+            print("Generation statistics:")
+            print(generator.stats)
     else:
         print("Using a predefined puzzle...")
         puzzle = [
@@ -84,14 +645,32 @@ def main():
         ]
 
     # Solve the puzzle
-    solver = solver_class(puzzle)
+    stats = SearchStats() if args.stats else None
+    if cache is not None:
+        solver_class = cached(solver_class, cache)
+    solver = solver_class(puzzle) if stats is None else solver_class(puzzle, stats=stats)
 
     if solver.solve():
         print("Solved puzzle:")
         for row in puzzle:
             print(" ".join(map(str, row)))
+    elif getattr(solver, "status", None) == "timeout":
+        print("No solver finished in time.")
+    elif getattr(solver, "status", None) == "error":
+        print("Every solver failed with an error.")
     else:
         print("Puzzle could not be solved.")
+    if isinstance(solver, PortfolioSolver):
+        print(f"Race ({solver.elapsed * 1000:.1f} ms):")
+        for name, outcome in solver.outcomes.items():
+            print(f"{name:>28}: {outcome}")
+    if stats is not None:
+        print("Search statistics:")
+        print(stats)
+    if cache is not None:
+        print("Cache statistics:")
+        print(cache)
+        cache.close()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from functools import lru_cache
+from math import isqrt
+
+from Board import _PARSE
+from SudokuIndex import board_index
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it grids are checked one at a time
+    np = None
+
+# Grids checked per NumPy pass, bounding the (count, 3N, N) gather to a few tens of MiB
+BLOCK = 16384
+
+
+@lru_cache(maxsize=None)
+def _unit_arrays(size):
+    # (3N, N) cells of each unit, and each value's bit: 0 for blanks, 1 << 31 for values above N
+    bits = np.full(256, 1 << 31, dtype=np.uint32)
+    bits[0] = 0
+    bits[1:size + 1] = 1 << np.arange(size, dtype=np.uint32)
+    return np.array(board_index(size).units), bits
+
+
+def validate_grids(grids, puzzles=None, complete=True):
+    """
+    Check a batch of N x N grids at once and return (valid, failures): a boolean mask with one
+    entry per grid, and the indices of the grids that failed.
+
+    `grids` is a (count, N, N) array, or anything NumPy turns into one, such as a list of Boards
+    or of lists of lists. With `complete` every row, column and box must hold each value 1-N
+    exactly once; otherwise blanks (0) are allowed and only repeated values fail. With `puzzles`,
+    of the same shape, every clue must also be kept in the grid at the same place.
+    """
+    if np is None:
+        return _validate_each(grids, puzzles, complete)
+    grids = np.asarray(grids, dtype=np.uint8)
+    if grids.ndim == 2:
+        grids = grids[np.newaxis]
+    count, size = len(grids), grids.shape[-1]
+    cells = grids.reshape(count, size * size)
+    if puzzles is not None:
+        clues = np.asarray(puzzles, dtype=np.uint8).reshape(cells.shape)
+    units, bits = _unit_arrays(size)
+    full = (1 << size) - 1
+
+    valid = np.empty(count, dtype=bool)
+    for start in range(0, count, BLOCK):
+        block = bits[cells[start:start + BLOCK]][:, units]  # (block, 3N, N) one bit per value
+        seen = np.bitwise_or.reduce(block, axis=2)
+        if complete:
+            # N cells whose bits cover all N values hold each value exactly once
+            ok = (seen == full).all(axis=1)
+        else:
+            # The bits of distinct values add up to their union; a repeat makes the sum larger
+            ok = (block.sum(axis=2, dtype=np.uint64) == seen).all(axis=1) & (seen <= full).all(axis=1)
+        if puzzles is not None:
+            given = clues[start:start + BLOCK]
+            ok &= ((given == 0) | (given == cells[start:start + BLOCK])).all(axis=1)
+        valid[start:start + BLOCK] = ok
+    return valid, np.flatnonzero(~valid)
+
+
+def _validate_each(grids, puzzles, complete):
+    # Pure-Python fallback with the same results, one grid at a time
+    grids = list(grids)
+    if grids and not hasattr(grids[0][0], "__len__"):
+        grids, puzzles = [grids], None if puzzles is None else [puzzles]  # A single grid
+    valid = []
+    for number, grid in enumerate(grids):
+        size = len(grid)
+        cells = [value for row in grid for value in row]
+        ok = all(value <= size for value in cells)
+        for unit in board_index(size).units if ok else ():
+            values = [cells[i] for i in unit if cells[i]]
+            if len(values) != len(set(values)) or complete and len(values) != size:
+                ok = False
+                break
+        if ok and puzzles is not None:
+            ok = all(clue in (0, value) for clue, value in zip((v for row in puzzles[number] for v in row), cells))
+        valid.append(ok)
+    return valid, [number for number, ok in enumerate(valid) if not ok]
+
+
+def parse_lines(lines):
+    """
+    Parse puzzle or solution lines of one board size into a (count, N, N) uint8 array in one pass
+    (lists of lists without NumPy). Unlike Board.from_line the characters are not checked here:
+    those outside the line format become 255, which validate_grids reports as invalid.
+    """
+    lines = [line.strip() for line in lines]
+    size = board_index(isqrt(len(lines[0]))).size if lines else 9
+    if any(len(line) != size * size for line in lines):
+        raise ValueError(f"expected lines of {size * size} characters")
+    data = "".join(lines).encode("ascii", "replace").translate(_PARSE)
+    if np is None:
+        area = size * size
+        return [
+            [list(data[start + row:start + row + size]) for row in range(0, area, size)]
+            for start in range(0, len(data), area)
+        ]
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(lines), size, size)